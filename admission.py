@@ -0,0 +1,91 @@
+import collections
+import math
+import os
+import threading
+import time
+
+import metrics
+
+# Defaults for the /api/contact limits; rates are requests per second and
+# 0 turns a limit off. contact_server.py can override them at startup.
+IP_RATE = float(os.environ.get('CONTACT_IP_RATE', '1'))
+IP_BURST = int(os.environ.get('CONTACT_IP_BURST', '10'))
+ORIGIN_RATE = float(os.environ.get('CONTACT_ORIGIN_RATE', '20'))
+ORIGIN_BURST = int(os.environ.get('CONTACT_ORIGIN_BURST', '100'))
+# Connections queued for or held by a server worker at once. Unset, the
+# server allows QUEUE_PER_WORKER per worker in its pool.
+MAX_CONCURRENT = int(os.environ['CONTACT_MAX_CONCURRENT']) if os.environ.get('CONTACT_MAX_CONCURRENT') else None
+QUEUE_PER_WORKER = 4
+# Buckets kept per limiter; the least recently seen client is dropped first
+MAX_KEYS = 10000
+
+
+# Token buckets keyed by client. Each key refills at `rate` tokens per
+# second up to `burst`; memory is bounded by evicting the least recently
+# used key (which then starts again with a full bucket).
+class KeyedRateLimiter:
+    def __init__(self, rate, burst, max_keys=MAX_KEYS):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    # Take a token for key; returns 0 if allowed, else seconds until one is
+    # available
+    def acquire(self, key):
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (1 - tokens) / self.rate
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+
+# Admission decisions. enter() is called as a connection is handed to the
+# worker pool, so a burst is turned away before it queues behind the pool;
+# admit() for one submission, before its body is read. Both return None
+# (admitted; call leave() once the connection is done with a worker after
+# enter()) or (reason, retry_after_seconds).
+class AdmissionControl:
+    def __init__(self, ip_rate=IP_RATE, ip_burst=IP_BURST, origin_rate=ORIGIN_RATE, origin_burst=ORIGIN_BURST,
+                 max_concurrent=MAX_CONCURRENT):
+        self.by_ip = KeyedRateLimiter(ip_rate, ip_burst) if ip_rate > 0 else None
+        self.by_origin = KeyedRateLimiter(origin_rate, origin_burst) if origin_rate > 0 else None
+        # None until the server sets it from its pool size; 0 is unlimited
+        self.max_concurrent = max_concurrent
+        self._active = 0
+        self._lock = threading.Lock()
+
+    def _reject(self, reason, wait):
+        metrics.ADMISSION_REJECTED.inc(reason)
+        return reason, max(1, math.ceil(wait))
+
+    def admit(self, ip, origin):
+        if self.by_ip is not None:
+            wait = self.by_ip.acquire(ip)
+            if wait:
+                return self._reject('ip_rate', wait)
+        if self.by_origin is not None:
+            wait = self.by_origin.acquire(origin)
+            if wait:
+                return self._reject('origin_rate', wait)
+        return None
+
+    def enter(self):
+        with self._lock:
+            if not self.max_concurrent or self._active < self.max_concurrent:
+                self._active += 1
+                return None
+        return self._reject('concurrency', 1)
+
+    def leave(self):
+        with self._lock:
+            self._active -= 1
@@ -0,0 +1,175 @@
+import base64
+import hashlib
+import hmac
+import logging
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import db
+
+logger = logging.getLogger(__name__)
+
+# scrypt cost: N (CPU/memory, power of two), r (block size), p (parallelism)
+SCRYPT_N = int(os.environ.get('AUTH_SCRYPT_N', str(2 ** 14)))
+SCRYPT_R = 8
+SCRYPT_P = 1
+# Each scrypt call takes 128 * N * r bytes (16 MB by default), so hashing
+# runs on this many threads to cap the memory and CPU a login storm can
+# take; callers wait at most HASH_TIMEOUT seconds for a turn and a result
+HASH_WORKERS = int(os.environ.get('AUTH_HASH_WORKERS', '4'))
+HASH_TIMEOUT = 30
+SESSION_TTL = 12 * 60 * 60
+# Signs session tokens; set AUTH_SECRET to keep sessions valid across restarts
+SECRET = os.environ.get('AUTH_SECRET', '').encode('utf-8') or secrets.token_bytes(32)
+
+_hash_pool = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix='auth-hash')
+_sessions_lock = threading.Lock()
+# token -> (username, expires_at)
+_sessions = {}
+# Logged-out tokens -> expires_at, so they are not re-admitted by signature
+_revoked = {}
+
+
+# Hashing is saturated; the caller should ask the user to retry
+class AuthBusy(Exception):
+    pass
+
+
+def _b64(data):
+    return base64.b64encode(data).decode('ascii')
+
+
+def _scrypt(password, salt, n, r, p):
+    return hashlib.scrypt(password.encode('utf-8'), salt=salt, n=n, r=r, p=p, maxmem=256 * 1024 * 1024, dklen=32)
+
+
+def _hash(password):
+    salt = secrets.token_bytes(16)
+    digest = _scrypt(password, salt, SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    return f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${_b64(salt)}${_b64(digest)}"
+
+
+def _verify(password, stored):
+    if not stored.startswith('scrypt$'):
+        # Legacy row holding the plaintext password
+        return hmac.compare_digest(password.encode('utf-8'), stored.encode('utf-8'))
+    _, n, r, p, salt, digest = stored.split('$')
+    candidate = _scrypt(password, base64.b64decode(salt), int(n), int(r), int(p))
+    return hmac.compare_digest(candidate, base64.b64decode(digest))
+
+
+def _run_hash(fn, *args):
+    future = _hash_pool.submit(fn, *args)
+    try:
+        return future.result(HASH_TIMEOUT)
+    except FutureTimeout:
+        # Still queued: don't spend a hash on an answer nobody is waiting for
+        future.cancel()
+        raise AuthBusy("Too many logins in progress, please retry")
+
+
+def hash_password(password):
+    return _run_hash(_hash, password)
+
+
+def verify_password(password, stored):
+    return _run_hash(_verify, password, stored)
+
+
+# Stands in for the stored hash of an unknown user; random, so no password
+# matches it
+DUMMY_HASH = f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${_b64(secrets.token_bytes(16))}${_b64(secrets.token_bytes(32))}"
+
+
+def needs_rehash(stored):
+    return not stored.startswith(f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}$")
+
+
+def register_user(username, email, password):
+    try:
+        db.write("INSERT INTO users (username, email, password) VALUES (?, ?, ?)",
+                 (username, email, hash_password(password)))
+        return True, "Registration successful. Please log in."
+    except sqlite3.IntegrityError:
+        return False, "Username already exists."
+    except AuthBusy as e:
+        return False, str(e)
+    except Exception as e:
+        return False, str(e)
+
+
+def _sign(payload):
+    return _b64(hmac.new(SECRET, payload.encode('utf-8'), hashlib.sha256).digest()).rstrip('=')
+
+
+def issue_token(username):
+    expires_at = int(time.time()) + SESSION_TTL
+    payload = f"{_b64(username.encode('utf-8'))}.{expires_at}.{secrets.token_hex(8)}"
+    token = f"{payload}.{_sign(payload)}"
+    with _sessions_lock:
+        _sessions[token] = (username, expires_at)
+    return token
+
+
+# Checks the username against its (unique-indexed) row, upgrades legacy
+# plaintext or outdated hashes, and returns a session token or None. Unknown
+# usernames are checked against DUMMY_HASH, so they cost the same scrypt
+# and take as long as real ones. Raises AuthBusy if hashing is saturated.
+def login_user(username, password):
+    try:
+        row = db.fetchone("SELECT id, password FROM users WHERE username = ?", (username,))
+        if row is None:
+            verify_password(password, DUMMY_HASH)
+            return None
+        if not verify_password(password, row[1]):
+            return None
+        if needs_rehash(row[1]):
+            db.write("UPDATE users SET password = ? WHERE id = ?", (hash_password(password), row[0]))
+            logger.info("Upgraded password hash for user id %s", row[0])
+        return issue_token(username)
+    except AuthBusy:
+        raise
+    except Exception as e:
+        logger.error("Login error: %s", e)
+        return None
+
+
+# Username for a valid token. Reruns hit the in-memory cache; a token from
+# before a restart is re-admitted if its signature and expiry check out.
+def validate_token(token):
+    if not token:
+        return None
+    now = time.time()
+    with _sessions_lock:
+        cached = _sessions.get(token)
+        if token in _revoked:
+            return None
+    if cached is not None:
+        if cached[1] > now:
+            return cached[0]
+        revoke_token(token)
+        return None
+    try:
+        payload, signature = token.rsplit('.', 1)
+        user_b64, expires_at, _ = payload.split('.')
+        if not hmac.compare_digest(signature, _sign(payload)) or int(expires_at) <= now:
+            return None
+        username = base64.b64decode(user_b64).decode('utf-8')
+    except (ValueError, UnicodeDecodeError):
+        return None
+    with _sessions_lock:
+        _sessions[token] = (username, int(expires_at))
+    return username
+
+
+def revoke_token(token):
+    now = time.time()
+    with _sessions_lock:
+        entry = _sessions.pop(token, None)
+        _revoked[token] = entry[1] if entry else now + SESSION_TTL
+        for stale in [t for t, expires_at in _revoked.items() if expires_at <= now]:
+            del _revoked[stale]
@@ -0,0 +1,156 @@
+import argparse
+import json
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import generation
+import html_artifact
+import llm_backend
+import prompts
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONCURRENCY = 4
+DEFAULT_RPM = 60
+
+
+# Spaces calls at least 60/rpm seconds apart across all worker threads.
+# acquire() returns False, without taking a slot, if the wait would be
+# longer than timeout seconds.
+class RateLimiter:
+    def __init__(self, rpm):
+        self.interval = 60.0 / rpm if rpm else 0.0
+        self._lock = threading.Lock()
+        self._next = time.monotonic()
+
+    def acquire(self, timeout=None):
+        if not self.interval:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next - now
+            if timeout is not None and wait > timeout:
+                return False
+            self._next = max(now, self._next) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+        return True
+
+
+# Each line: {"id": "...", "prompt": "...", "edits": ["...", ...]}; id and
+# edits are optional
+def load_jobs(path):
+    jobs = []
+    with open(path, encoding='utf-8') as f:
+        for lineno, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            job = json.loads(line)
+            if not job.get('prompt'):
+                raise ValueError(f"{path}:{lineno}: missing 'prompt'")
+            job_id = str(job.get('id') or f"item-{lineno:05d}")
+            job['id'] = re.sub(r'[^A-Za-z0-9_.-]', '_', job_id)
+            job.setdefault('edits', [])
+            jobs.append(job)
+    return jobs
+
+
+def _write_atomic(path, data):
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def meta_path(output_dir, job_id):
+    return os.path.join(output_dir, f"{job_id}.json")
+
+
+# A job is done once its metadata file records success; the HTML is
+# written first, so a present .json always has its page next to it
+def is_done(output_dir, job_id):
+    try:
+        with open(meta_path(output_dir, job_id), encoding='utf-8') as f:
+            return json.load(f).get('status') == 'ok'
+    except (OSError, ValueError):
+        return False
+
+
+def _call(prompt, model_name, bypass_cache, kind):
+    start = time.perf_counter()
+    html = generation.generate_text(prompt, model_name=model_name, bypass_cache=bypass_cache, kind=kind)
+    return html_artifact.strip_fences(html), time.perf_counter() - start
+
+
+def run_job(job, output_dir, model_name=generation.MODEL_NAME, bypass_cache=False):
+    meta = {'id': job['id'], 'prompt': job['prompt'], 'edits': job['edits'], 'model': model_name,
+            'started_at': time.time(), 'calls': []}
+    try:
+        html, elapsed = _call(prompts.generate_prompt(job['prompt']), model_name, bypass_cache, 'generate')
+        meta['calls'].append({'kind': 'generate', 'seconds': round(elapsed, 3), 'chars': len(html)})
+        for instructions in job['edits']:
+            html, elapsed = _call(prompts.edit_prompt(html, instructions), model_name, bypass_cache, 'edit')
+            meta['calls'].append({'kind': 'edit', 'seconds': round(elapsed, 3), 'chars': len(html)})
+        artifact = html_artifact.process(html)
+        _write_atomic(os.path.join(output_dir, f"{job['id']}.html"), artifact.html)
+        meta['sha256'] = artifact.content_hash
+        meta['bytes'] = len(artifact.body)
+        meta['problems'] = artifact.problems
+        meta['status'] = 'ok'
+    except Exception as e:
+        logger.error("Job %s failed: %s", job['id'], e)
+        meta['status'] = 'error'
+        meta['error'] = str(e)
+    meta['finished_at'] = time.time()
+    meta['seconds'] = round(meta['finished_at'] - meta['started_at'], 3)
+    _write_atomic(meta_path(output_dir, job['id']), json.dumps(meta, indent=2))
+    return meta
+
+
+# Requests per minute are limited by the backend (generation.set_backend's
+# limiter), so retries and hedged requests count too
+def run_batch(input_path, output_dir, concurrency=DEFAULT_CONCURRENCY, model_name=generation.MODEL_NAME,
+              bypass_cache=False):
+    os.makedirs(output_dir, exist_ok=True)
+    jobs = load_jobs(input_path)
+    pending = [job for job in jobs if not is_done(output_dir, job['id'])]
+    logger.info("%d jobs, %d already done, %d to run", len(jobs), len(jobs) - len(pending), len(pending))
+
+    summary = {'ok': 0, 'error': 0}
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(run_job, job, output_dir, model_name, bypass_cache) for job in pending]
+        for future in as_completed(futures):
+            meta = future.result()
+            summary[meta['status']] += 1
+            logger.info("%s: %s in %ss", meta['id'], meta['status'], meta['seconds'])
+    summary['skipped'] = len(jobs) - len(pending)
+    summary['seconds'] = round(time.perf_counter() - start, 3)
+    return summary
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generate webpages in bulk from a JSONL file of prompts")
+    parser.add_argument('input', help="JSONL file with one {\"id\", \"prompt\", \"edits\"} object per line")
+    parser.add_argument('--output-dir', default='batch_output')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument('--rpm', type=float, default=DEFAULT_RPM, help="Max model requests per minute (0 = no limit)")
+    parser.add_argument('--model', default=generation.MODEL_NAME)
+    parser.add_argument('--bypass-cache', action='store_true')
+    parser.add_argument('--api-key', default=os.environ.get('GEMINI_API_KEY'))
+    parser.add_argument('--backend', choices=['gemini', 'stub'], default=os.environ.get('LLM_BACKEND', 'gemini'))
+    parser.add_argument('--stub-latency', type=float, default=llm_backend.DEFAULT_STUB_LATENCY)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.backend == 'gemini' and not args.api_key:
+        parser.error("Pass --api-key or set GEMINI_API_KEY")
+    generation.set_backend(llm_backend.create_backend(args.backend, args.api_key, args.stub_latency),
+                           limiter=RateLimiter(args.rpm))
+    result = run_batch(args.input, args.output_dir, args.concurrency, args.model, args.bypass_cache)
+    print(json.dumps(result))
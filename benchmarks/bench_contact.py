@@ -0,0 +1,240 @@
+import argparse
+import http.client
+import json
+import os
+import queue
+import random
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Local servers this suite can start. app.py and final.py both serve
+# /api/contact through contact_server.py, so one target covers them. The
+# load comes from a single client, so per-client rate limits are off.
+TARGETS = {
+    'flask': {
+        'port': 5000,
+        'cmd': [sys.executable, '-c', 'import backend; backend.app.run(port={port}, debug=False)'],
+        'persists': False,
+    },
+    'contact_server': {
+        'port': 8000,
+        'cmd': [sys.executable, 'contact_server.py', '--port', '{port}', '--db', '{db}',
+                '--ip-rate', '0', '--origin-rate', '0', '--max-concurrent', '0'],
+        'persists': True,
+    },
+}
+
+
+def count_rows(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute('SELECT count(*) FROM contact_submissions').fetchone()[0]
+    finally:
+        conn.close()
+
+
+def wait_for_port(host, port, timeout=15):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection((host, port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Server on {host}:{port} did not come up within {timeout}s")
+
+
+def start_target(name, port, db_path):
+    target = TARGETS[name]
+    cmd = [part.format(port=port, db=db_path) for part in target['cmd']]
+    proc = subprocess.Popen(cmd, cwd=REPO_ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_port('localhost', port)
+    except Exception:
+        proc.kill()
+        raise
+    return proc
+
+
+def make_payload(rng, payload_size, invalid):
+    message = ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz ') for _ in range(payload_size))
+    body = {'name': f"Bench User {rng.randrange(10 ** 6)}", 'email': 'bench@example.com', 'message': message}
+    if invalid:
+        # Alternate between a missing field and a malformed body
+        if rng.random() < 0.5:
+            del body['email']
+        else:
+            return b'{"name": "broken"', False
+    return json.dumps(body).encode('utf-8'), not invalid
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+# Open-loop load: requests are scheduled at a fixed rate whatever the
+# server's speed, and latency is measured from the scheduled send time so
+# queueing behind a slow server is counted
+def run_load(url, rate, duration, concurrency, payload_size, invalid_ratio, seed=0):
+    parts = urlsplit(url)
+    rng = random.Random(seed)
+    total = int(rate * duration)
+    payloads = [make_payload(rng, payload_size, rng.random() < invalid_ratio) for _ in range(min(total, 1000))]
+    work = queue.Queue()
+    results = []
+    results_lock = threading.Lock()
+
+    def worker():
+        conn = None
+        local = []
+        while True:
+            item = work.get()
+            if item is None:
+                break
+            scheduled, (body, valid) = item
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            status = None
+            try:
+                if conn is None:
+                    conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=30)
+                conn.request('POST', parts.path or '/api/contact', body, {'Content-Type': 'application/json'})
+                response = conn.getresponse()
+                response.read()
+                status = response.status
+                if response.getheader('Connection', '').lower() == 'close':
+                    conn.close()
+                    conn = None
+            except (OSError, http.client.HTTPException):
+                if conn is not None:
+                    conn.close()
+                conn = None
+            local.append((time.perf_counter() - scheduled, status, valid))
+        if conn is not None:
+            conn.close()
+        with results_lock:
+            results.extend(local)
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    start = time.perf_counter() + 0.05
+    for i in range(total):
+        work.put((start + i / rate, payloads[i % len(payloads)]))
+    for _ in threads:
+        work.put(None)
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(r[0] for r in results)
+    ok = sum(1 for _, status, valid in results if valid and status == 200)
+    rejected = sum(1 for _, status, valid in results if not valid and status == 400)
+    throttled = sum(1 for _, status, _ in results if status == 429)
+    errors = len(results) - ok - rejected - throttled
+    return {
+        'requests': len(results),
+        'elapsed_s': round(elapsed, 3),
+        'throughput_rps': round(len(results) / elapsed, 2) if elapsed else None,
+        'ok': ok,
+        'rejected_invalid': rejected,
+        'throttled': throttled,
+        'errors': errors,
+        'error_rate': round(errors / len(results), 4) if results else None,
+        'latency_ms': {f"p{p}": round(percentile(latencies, p) * 1000, 2) if latencies else None
+                       for p in (50, 95, 99)},
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench_target(name, args):
+    port = args.port or TARGETS[name]['port']
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        proc = start_target(name, port, db_path)
+        try:
+            stats = run_load(f"http://localhost:{port}/api/contact", args.rate, args.duration, args.concurrency,
+                             args.payload_size, args.invalid_ratio, args.seed)
+        finally:
+            proc.terminate()
+            try:
+                proc.wait(10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        stats['rows_persisted'] = count_rows(db_path) if TARGETS[name]['persists'] else None
+    return stats
+
+
+# Flag targets whose throughput dropped or p99 grew by more than tolerance
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, stats in results['targets'].items():
+        old = baseline.get('targets', {}).get(name)
+        if not old:
+            continue
+        if old['throughput_rps'] and stats['throughput_rps'] < old['throughput_rps'] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {old['throughput_rps']} -> {stats['throughput_rps']} rps")
+        old_p99, new_p99 = old['latency_ms']['p99'], stats['latency_ms']['p99']
+        if old_p99 and new_p99 and new_p99 > old_p99 * (1 + tolerance):
+            regressions.append(f"{name}: p99 {old_p99} -> {new_p99} ms")
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Load test the /api/contact implementations")
+    parser.add_argument('--targets', nargs='+', choices=sorted(TARGETS), default=sorted(TARGETS))
+    parser.add_argument('--rate', type=float, default=200, help="Requests per second (open loop)")
+    parser.add_argument('--duration', type=float, default=10, help="Seconds of load per target")
+    parser.add_argument('--concurrency', type=int, default=32, help="Client connections / max in flight")
+    parser.add_argument('--payload-size', type=int, default=200, help="Message length in characters")
+    parser.add_argument('--invalid-ratio', type=float, default=0.0, help="Share of invalid payloads (0-1)")
+    parser.add_argument('--port', type=int, help="Override the target's default port")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Write JSON results to this file")
+    parser.add_argument('--baseline', help="Previous results file to check for regressions")
+    parser.add_argument('--tolerance', type=float, default=0.1)
+    args = parser.parse_args()
+
+    results = {
+        'revision': git_revision(),
+        'timestamp': time.time(),
+        'params': {k: getattr(args, k) for k in ('rate', 'duration', 'concurrency', 'payload_size',
+                                                 'invalid_ratio', 'seed')},
+        'targets': {},
+    }
+    for name in args.targets:
+        try:
+            results['targets'][name] = bench_target(name, args)
+        except Exception as e:
+            print(f"{name}: failed to benchmark: {e}", file=sys.stderr)
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    print(output)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,79 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APPS = ['app.py', 'final.py']
+# Modules whose import cost matters for the first paint
+IMPORTS = ['streamlit', 'pandas', 'google.generativeai', 'db', 'generation', 'contact_server', 'submissions_view']
+
+
+def import_time(module):
+    code = (f"import sys, time; sys.path.insert(0, {REPO_ROOT!r}); t = time.perf_counter(); import {module}; "
+            "print(time.perf_counter() - t)")
+    try:
+        out = subprocess.check_output([sys.executable, '-c', code], stderr=subprocess.DEVNULL, cwd=REPO_ROOT)
+        return round(float(out.decode().strip()) * 1000, 1)
+    except (subprocess.CalledProcessError, ValueError):
+        return None
+
+
+# Runs inside a fresh interpreter: time the first script run (cold start,
+# including imports and one-time init) and then repeated reruns
+def child(app, reruns):
+    from streamlit.testing.v1 import AppTest
+    start = time.perf_counter()
+    at = AppTest.from_file(os.path.join(REPO_ROOT, app), default_timeout=60)
+    at.run()
+    first = time.perf_counter() - start
+    rerun_times = []
+    for _ in range(reruns):
+        start = time.perf_counter()
+        at.run()
+        rerun_times.append(time.perf_counter() - start)
+    rerun_times.sort()
+    print(json.dumps({
+        'first_run_ms': round(first * 1000, 1),
+        'rerun_median_ms': round(rerun_times[len(rerun_times) // 2] * 1000, 1) if rerun_times else None,
+        'rerun_max_ms': round(rerun_times[-1] * 1000, 1) if rerun_times else None,
+        'exceptions': [str(e.value) for e in at.exception],
+    }))
+
+
+def bench_app(app, reruns):
+    env = dict(os.environ, LLM_BACKEND='stub', PYTHONPATH=REPO_ROOT)
+    # Fresh working directory so the run creates its own submissions.db
+    with tempfile.TemporaryDirectory() as tmp:
+        proc = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', app, '--reruns', str(reruns)],
+                              cwd=tmp, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        return {'error': proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else 'failed'}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Measure Streamlit app cold start and rerun time")
+    parser.add_argument('--apps', nargs='+', default=APPS)
+    parser.add_argument('--reruns', type=int, default=10)
+    parser.add_argument('--output', help="Write JSON results to this file")
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.reruns)
+        sys.exit(0)
+
+    results = {
+        'timestamp': time.time(),
+        'import_ms': {module: import_time(module) for module in IMPORTS},
+        'apps': {app: bench_app(app, args.reruns) for app in args.apps},
+    }
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    print(output)
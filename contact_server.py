@@ -0,0 +1,483 @@
+import argparse
+import hmac
+import itertools
+import json
+import logging
+import os
+import queue
+import re
+import selectors
+import signal
+import socket
+import threading
+import time
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from urllib.parse import parse_qs, urlsplit
+
+import admission
+import db
+import export
+import metrics
+import retention
+from page_store import PageStore
+from write_behind import SubmissionWriter
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = 'submissions.db'
+DEFAULT_HOST = 'localhost'
+DEFAULT_PORT = 8000
+DEFAULT_WORKERS = int(os.environ.get('CONTACT_SERVER_WORKERS', '16'))
+# Idle keep-alive connections are parked (not holding a worker) and closed
+# after this many seconds
+KEEP_ALIVE_TIMEOUT = 15
+# Socket timeout while a worker is reading or writing one request
+REQUEST_TIMEOUT = 10
+# Largest /api/contact body accepted; bigger ones get 413 without being read
+MAX_BODY = int(os.environ.get('CONTACT_MAX_BODY', str(64 * 1024)))
+# Paths reported individually in metrics; everything else is 'other'
+METRIC_PATHS = ('/api/contact', '/api/export', '/metrics', '/pages')
+# Pages are served per session or user, under /pages/<key>/ (see page_store.py)
+LATEST_PAGE = re.compile(r'^/pages/([\w-]+)/(?:(generated|edited)\.html)?$')
+REVISION_PAGE = re.compile(r'^/pages/([\w-]+)/revisions/(\d+)\.html$')
+# Bearer token for /api/export; the endpoint is disabled when unset
+EXPORT_TOKEN = os.environ.get('CONTACT_EXPORT_TOKEN', '')
+
+
+# Handler for /api/contact (shared by app.py and final.py)
+class ContactHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 keeps connections open between requests, so every response
+    # must carry an explicit Content-Length
+    protocol_version = 'HTTP/1.1'
+    timeout = REQUEST_TIMEOUT
+
+    # Serve the request that made the connection readable (plus any already
+    # pipelined behind it), then hand the connection back to the server to
+    # wait for the next one without occupying a worker
+    def handle(self):
+        self.close_connection = True
+        self.handle_one_request()
+        while not self.close_connection and self._has_buffered_request():
+            self.handle_one_request()
+
+    # Errors sent before parse_request (e.g. 414 for an oversized request
+    # line) are timed too, so the clock starts here
+    def handle_one_request(self):
+        self._status = None
+        self._started = time.perf_counter()
+        super().handle_one_request()
+        if self._status is not None:
+            path = urlsplit(getattr(self, 'path', '')).path
+            if path.startswith('/pages/'):
+                path = '/pages'
+            path = path if path in METRIC_PATHS else 'other'
+            status = str(self._status)
+            metrics.HTTP_REQUESTS.inc(path, status)
+            metrics.HTTP_LATENCY.observe(time.perf_counter() - self._started, path, status)
+
+    def send_response(self, code, message=None):
+        self._status = code
+        super().send_response(code, message)
+
+    def _has_buffered_request(self):
+        self.connection.setblocking(False)
+        try:
+            return bool(self.rfile.peek(1))
+        except OSError:
+            return False
+        finally:
+            self.connection.settimeout(self.timeout)
+
+    def log_message(self, format, *args):
+        logger.debug("%s - " + format, self.address_string(), *args)
+
+    def send_cors_headers(self):
+        self.send_header('Access-Control-Allow-Origin', '*')
+
+    def send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_cors_headers()
+        if self.close_connection:
+            self.send_header('Connection', 'close')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_empty(self, status):
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        if self.close_connection:
+            self.send_header('Connection', 'close')
+        self.end_headers()
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        if parts.path == '/metrics':
+            body = metrics.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif parts.path == '/api/export':
+            self.send_export(parse_qs(parts.query))
+        else:
+            self.send_page_for(parts.path)
+
+    def do_HEAD(self):
+        self.send_page_for(urlsplit(self.path).path, head=True)
+
+    # Generated pages, under the session's or user's key: /pages/<key>/ is
+    # the latest edit (or generation), /pages/<key>/generated.html and
+    # edited.html the latest of each, and stored revisions are at
+    # /pages/<key>/revisions/<id>.html
+    def send_page_for(self, path, head=False):
+        pages = self.server.pages
+        artifact = None
+        immutable = False
+        match = REVISION_PAGE.match(path)
+        if match:
+            artifact = pages.revision(int(match.group(2)), match.group(1))
+            immutable = True
+        else:
+            match = LATEST_PAGE.match(path)
+            if match and match.group(2):
+                artifact = pages.latest(match.group(1), match.group(2))
+            elif match:
+                artifact = pages.latest(match.group(1), 'edited') or pages.latest(match.group(1), 'generated')
+        if artifact is None:
+            self.send_empty(404)
+            return
+        self.send_page(artifact, immutable, head)
+
+    # Revisions never change and are cached for good; the latest pages are
+    # revalidated on every load and answered with 304 while unchanged. Pages
+    # belong to one user, so shared caches must not keep them.
+    def send_page(self, artifact, immutable=False, head=False):
+        encoding, body, etag = artifact.negotiate(self.headers.get('Accept-Encoding'))
+        cache_control = 'private, max-age=31536000, immutable' if immutable else 'private, no-cache'
+        tags = [tag.strip().removeprefix('W/') for tag in self.headers.get('If-None-Match', '').split(',')]
+        if etag in tags or '*' in tags:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', cache_control)
+            self.send_header('Vary', 'Accept-Encoding')
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        if encoding != 'identity':
+            self.send_header('Content-Encoding', encoding)
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', cache_control)
+        self.send_header('Vary', 'Accept-Encoding')
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+
+    # GET /api/export?format=csv|ndjson|parquet&compression=...&since=...
+    # &until=...&after_id=N streams the matching submissions in id order with
+    # chunked encoding. Rows carry their id, so the last one received is the
+    # after_id for the next incremental export.
+    def send_export(self, params):
+        token = self.server.export_token
+        if not token:
+            self.send_json(404, {"error": "Export is disabled; set CONTACT_EXPORT_TOKEN"})
+            return
+        if not hmac.compare_digest(self.headers.get('Authorization', ''), f"Bearer {token}"):
+            self.send_json(401, {"error": "Missing or invalid export token"}, {'WWW-Authenticate': 'Bearer'})
+            return
+        param = lambda name, default=None: params.get(name, [default])[0]
+        fmt, compression = param('format', 'csv'), param('compression', 'none')
+        try:
+            export.check_options(fmt, compression)
+            after_id = int(param('after_id', '0'))
+            chunks = export.stream(fmt, compression, export.parse_time(param('since')),
+                                   export.parse_time(param('until')), after_id, db_path=self.server.db_path)
+            first = next(chunks, b'')
+        except ValueError as e:
+            self.send_json(400, {"error": str(e)})
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', export.CONTENT_TYPES[fmt])
+        self.send_header('Content-Disposition', f'attachment; filename="{export.filename(fmt, compression)}"')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        try:
+            for chunk in itertools.chain([first], chunks):
+                if chunk:
+                    self.wfile.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+            self.wfile.write(b'0\r\n\r\n')
+        except Exception as e:
+            # Headers are gone; cut the response short so the client sees an
+            # incomplete body rather than a clean end
+            logger.error("Export failed after %s: %s", self.path, e)
+            self.close_connection = True
+
+    def do_OPTIONS(self):
+        if self.path == '/api/contact':
+            # CORS preflight for fetch() calls with a JSON body
+            self.send_response(204)
+            self.send_cors_headers()
+            self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
+            self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+            self.send_header('Access-Control-Max-Age', '86400')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+        else:
+            self.send_empty(404)
+
+    def do_POST(self):
+        if self.path != '/api/contact':
+            self.close_connection = True
+            self.send_empty(404)
+            return
+        # Decide before the body is read, so rejected traffic costs no JSON
+        # parsing and never reaches the writer queue or SQLite
+        rejected = self.server.admission.admit(self.client_address[0], self.headers.get('Origin', ''))
+        if rejected is not None:
+            reason, retry_after = rejected
+            logger.debug("Rejected submission from %s (%s)", self.client_address[0], reason)
+            # The unread body would be taken for the next request, so close
+            self.close_connection = True
+            self.send_json(429, {"error": "Too many requests, please retry later"},
+                           {'Retry-After': str(retry_after)})
+            return
+        self.handle_submission()
+
+    def handle_submission(self):
+        try:
+            content_length = int(self.headers.get('Content-Length', 0))
+            if content_length < 0:
+                raise ValueError("negative Content-Length")
+            if content_length > MAX_BODY:
+                self.close_connection = True
+                self.send_json(413, {"error": f"Request body larger than {MAX_BODY} bytes"})
+                return
+            post_data = self.rfile.read(content_length)
+            data = json.loads(post_data.decode('utf-8'))
+            if not isinstance(data, dict):
+                raise ValueError("expected a JSON object")
+        except (ValueError, UnicodeDecodeError) as e:
+            self.close_connection = True
+            self.send_json(400, {"error": f"Invalid request body: {e}"})
+            return
+
+        try:
+            name = data.get('name')
+            email = data.get('email')
+            message = data.get('message')
+
+            if not all([name, email, message]):
+                logger.warning("Form submission failed: Missing fields.")
+                self.send_json(400, {"error": "All fields required"})
+                return
+
+            # Hand the row to the group-commit writer and only acknowledge
+            # once its batch is durable
+            try:
+                pending = self.server.writer.submit(name, email, message)
+            except queue.Full:
+                logger.warning("Submission queue full, rejecting request.")
+                self.send_json(503, {"error": "Server busy, please retry"}, {'Retry-After': '1'})
+                return
+            pending.wait()
+            self.server.last_submission = f"Stored: Name={name}, Email={email}, Message={message}"
+
+            self.send_json(200, {"message": "Form submitted successfully!"})
+        except Exception as e:
+            logger.error("Error in POST handler: %s", e)
+            self.close_connection = True
+            self.send_json(500, {"error": str(e)})
+
+
+# HTTPServer that hands ready connections to a fixed pool of worker threads.
+# Between requests keep-alive connections wait in a selector, so a handful
+# of workers can serve many open connections.
+class ContactServer(HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, server_address, handler_class=ContactHandler,
+                 workers=DEFAULT_WORKERS, db_path=DB_PATH, admission_control=None):
+        super().__init__(server_address, handler_class)
+        self.db_path = db_path
+        db.init_db(db_path)
+        self.admission = admission_control or admission.AdmissionControl()
+        if self.admission.max_concurrent is None:
+            self.admission.max_concurrent = workers * admission.QUEUE_PER_WORKER
+        self.last_submission = ""
+        self.export_token = EXPORT_TOKEN
+        self.pages = PageStore(db_path)
+        self.writer = SubmissionWriter(db_path)
+        metrics.WRITE_QUEUE_DEPTH.set_function(self.writer.depth)
+        # Archive old submissions in the background when CONTACT_RETENTION_DAYS is set
+        self.retention = retention.RetentionJob(db_path=db_path).start() if retention.RETENTION_DAYS else None
+        self.workers = workers
+        self._requests = queue.Queue()
+        self._idle = selectors.DefaultSelector()
+        self._idle_lock = threading.Lock()
+        self._wakeup_r, self._wakeup_w = socket.socketpair()
+        self._idle.register(self._wakeup_r, selectors.EVENT_READ)
+        self._stopping = False
+        self._threads = []
+        for i in range(workers):
+            t = threading.Thread(target=self._worker, name=f"contact-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        self._poller = threading.Thread(target=self._poll_idle, name="contact-keepalive", daemon=True)
+        self._poller.start()
+
+    def finish_request(self, request, client_address):
+        return self.RequestHandlerClass(request, client_address, self)
+
+    def _worker(self):
+        db.use_own_connection()
+        while True:
+            item = self._requests.get()
+            if item is None:
+                return
+            request, client_address = item
+            keep_alive = False
+            try:
+                handler = self.finish_request(request, client_address)
+                keep_alive = not handler.close_connection and not self._stopping
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.admission.leave()
+            if keep_alive:
+                self._park(request, client_address)
+            else:
+                self.shutdown_request(request)
+
+    def process_request(self, request, client_address):
+        self._dispatch(request, client_address)
+
+    # Queue a connection with a request waiting for a worker, or turn it
+    # away at once when max_concurrent connections are queued or in flight
+    def _dispatch(self, request, client_address):
+        rejected = self.admission.enter()
+        if rejected is None:
+            self._requests.put((request, client_address))
+            return
+        logger.debug("Rejected connection from %s (%s)", client_address[0], rejected[0])
+        body = b'{"error": "Server busy, please retry later"}'
+        response = (f"HTTP/1.1 429 Too Many Requests\r\nContent-Type: application/json\r\n"
+                    f"Content-Length: {len(body)}\r\nRetry-After: {rejected[1]}\r\n"
+                    f"Access-Control-Allow-Origin: *\r\nConnection: close\r\n\r\n").encode('ascii') + body
+        try:
+            # Runs on the accepting thread, so never wait on a slow client
+            request.setblocking(False)
+            request.send(response)
+        except OSError:
+            pass
+        self.shutdown_request(request)
+
+    def _park(self, request, client_address):
+        with self._idle_lock:
+            self._idle.register(request, selectors.EVENT_READ, (client_address, time.monotonic()))
+        self._wakeup_w.send(b'\0')
+
+    # Re-dispatch parked connections once the next request arrives; close
+    # the ones that stay idle too long
+    def _poll_idle(self):
+        last_sweep = time.monotonic()
+        while not self._stopping:
+            events = self._idle.select(timeout=1.0)
+            now = time.monotonic()
+            with self._idle_lock:
+                for key, _ in events:
+                    if key.fileobj is self._wakeup_r:
+                        self._wakeup_r.recv(4096)
+                        continue
+                    self._idle.unregister(key.fileobj)
+                    self._dispatch(key.fileobj, key.data[0])
+                if now - last_sweep < 1.0:
+                    continue
+                last_sweep = now
+                for key in list(self._idle.get_map().values()):
+                    if key.fileobj is not self._wakeup_r and now - key.data[1] > KEEP_ALIVE_TIMEOUT:
+                        self._idle.unregister(key.fileobj)
+                        self.shutdown_request(key.fileobj)
+
+    def _close_idle(self):
+        with self._idle_lock:
+            for key in list(self._idle.get_map().values()):
+                self._idle.unregister(key.fileobj)
+                if key.fileobj is not self._wakeup_r:
+                    self.shutdown_request(key.fileobj)
+            self._idle.close()
+        self._wakeup_r.close()
+        self._wakeup_w.close()
+
+    def graceful_shutdown(self, timeout=REQUEST_TIMEOUT):
+        # Stop accepting, let workers drain queued and in-flight requests,
+        # close idle keep-alive connections, then release the listening socket
+        self.shutdown()
+        self._stopping = True
+        self._wakeup_w.send(b'\0')
+        self._poller.join(timeout)
+        for _ in self._threads:
+            self._requests.put(None)
+        for t in self._threads:
+            t.join(timeout)
+        self._close_idle()
+        if self.retention is not None:
+            self.retention.stop()
+        self.writer.close()
+        self.server_close()
+        logger.info("HTTP server stopped.")
+
+
+def create_server(host=DEFAULT_HOST, port=DEFAULT_PORT, workers=DEFAULT_WORKERS, db_path=DB_PATH,
+                  admission_control=None):
+    return ContactServer((host, port), ContactHandler, workers=workers, db_path=db_path,
+                         admission_control=admission_control)
+
+
+# Start the server on a background thread and return it
+def start_server(host=DEFAULT_HOST, port=DEFAULT_PORT, workers=DEFAULT_WORKERS, db_path=DB_PATH,
+                 admission_control=None):
+    httpd = create_server(host, port, workers, db_path, admission_control)
+    threading.Thread(target=httpd.serve_forever, name="contact-server", daemon=True).start()
+    logger.info("Starting HTTP server on http://%s:%s with %d workers", host, port, workers)
+    return httpd
+
+
+# Run the server in the foreground until SIGINT/SIGTERM
+def run_server(host=DEFAULT_HOST, port=DEFAULT_PORT, workers=DEFAULT_WORKERS, db_path=DB_PATH,
+               admission_control=None):
+    httpd = start_server(host, port, workers, db_path, admission_control)
+    stop = threading.Event()
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    stop.wait()
+    httpd.graceful_shutdown()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Contact form ingestion server")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    parser.add_argument('--db', default=DB_PATH)
+    parser.add_argument('--ip-rate', type=float, default=admission.IP_RATE,
+                        help="Submissions per second per client IP (0 = unlimited)")
+    parser.add_argument('--ip-burst', type=int, default=admission.IP_BURST)
+    parser.add_argument('--origin-rate', type=float, default=admission.ORIGIN_RATE,
+                        help="Submissions per second per Origin header (0 = unlimited)")
+    parser.add_argument('--origin-burst', type=int, default=admission.ORIGIN_BURST)
+    parser.add_argument('--max-concurrent', type=int, default=admission.MAX_CONCURRENT,
+                        help="Connections queued or being served at once "
+                             f"(default: {admission.QUEUE_PER_WORKER} per worker, 0 = unlimited)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    limits = admission.AdmissionControl(args.ip_rate, args.ip_burst, args.origin_rate, args.origin_burst,
+                                        args.max_concurrent)
+    run_server(args.host, args.port, args.workers, args.db, limits)
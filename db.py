@@ -0,0 +1,288 @@
+import contextlib
+import logging
+import sqlite3
+import threading
+import time
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = 'submissions.db'
+
+# Connection tuning, applied once when a connection is opened
+JOURNAL_MODE = 'WAL'
+SYNCHRONOUS = 'NORMAL'
+CACHE_SIZE_KB = 16384
+MMAP_SIZE = 64 * 1024 * 1024
+BUSY_TIMEOUT = 5.0
+# Size of sqlite3's per-connection prepared statement cache
+CACHED_STATEMENTS = 256
+
+_local = threading.local()
+# Process-wide connections, one per database file, for threads without their own
+_shared = {}
+_shared_lock = threading.RLock()
+_stats_lock = threading.Lock()
+_query_stats = {}
+# sql -> operation label (SELECT, INSERT, ...) for the latency histogram
+_operations = {}
+
+
+def connect(db_path=None):
+    conn = sqlite3.connect(db_path or DB_PATH, timeout=BUSY_TIMEOUT,
+                           check_same_thread=False, cached_statements=CACHED_STATEMENTS)
+    # Only takes effect on a new, empty database (so it must come before the
+    # journal mode is written); retention.py converts existing ones
+    conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+    conn.execute(f'PRAGMA journal_mode={JOURNAL_MODE}')
+    conn.execute(f'PRAGMA synchronous={SYNCHRONOUS}')
+    conn.execute(f'PRAGMA cache_size=-{CACHE_SIZE_KB}')
+    conn.execute(f'PRAGMA mmap_size={MMAP_SIZE}')
+    return conn
+
+
+# Threads that live as long as the process (server workers, the submission
+# writer, retention) call this once to get connections of their own. Every
+# other thread - each Streamlit rerun runs on a new one - shares a single
+# process-wide connection per file, so its PRAGMAs and statement cache
+# survive reruns; use is serialised by locked().
+def use_own_connection():
+    _local.own = True
+
+
+def _owns_connection():
+    return getattr(_local, 'own', False)
+
+
+# Hold this around statements that must not interleave with other threads',
+# such as a multi-statement transaction. A no-op on a thread's own connection.
+def locked():
+    return contextlib.nullcontext() if _owns_connection() else _shared_lock
+
+
+# Long-lived connection for the calling thread (its own, or the shared one),
+# one per database file
+def get_connection(db_path=None):
+    db_path = db_path or DB_PATH
+    if not _owns_connection():
+        with _shared_lock:
+            conn = _shared.get(db_path)
+            if conn is None:
+                conn = _shared[db_path] = connect(db_path)
+                logger.debug("Opened shared SQLite connection to %s", db_path)
+        return conn
+    conns = getattr(_local, 'conns', None)
+    if conns is None:
+        conns = _local.conns = {}
+    conn = conns.get(db_path)
+    if conn is None:
+        conn = conns[db_path] = connect(db_path)
+        logger.debug("Opened SQLite connection to %s for %s", db_path, threading.current_thread().name)
+    return conn
+
+
+def close_connection(db_path=None):
+    if _owns_connection():
+        conn = getattr(_local, 'conns', {}).pop(db_path or DB_PATH, None)
+    else:
+        with _shared_lock:
+            conn = _shared.pop(db_path or DB_PATH, None)
+    if conn is not None:
+        conn.close()
+
+
+def _record(sql, elapsed):
+    with _stats_lock:
+        stats = _query_stats.get(sql)
+        if stats is None:
+            stats = _query_stats[sql] = {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0}
+            _operations[sql] = sql.split(None, 1)[0].upper()
+        ms = elapsed * 1000.0
+        stats['count'] += 1
+        stats['total_ms'] += ms
+        if ms > stats['max_ms']:
+            stats['max_ms'] = ms
+        operation = _operations[sql]
+    if operation == 'COMMIT':
+        metrics.SQLITE_COMMIT_LATENCY.observe(elapsed)
+    else:
+        metrics.SQLITE_QUERY_LATENCY.observe(elapsed, operation)
+    logger.debug("SQL %.2f ms: %s", ms, sql)
+
+
+# Snapshot of per-statement timings: {sql: {count, total_ms, max_ms}}
+def query_stats():
+    with _stats_lock:
+        return {' '.join(sql.split()): dict(stats) for sql, stats in _query_stats.items()}
+
+
+def execute(sql, params=(), db_path=None):
+    with locked():
+        conn = get_connection(db_path)
+        start = time.perf_counter()
+        try:
+            return conn.execute(sql, params)
+        finally:
+            _record(sql, time.perf_counter() - start)
+
+
+def executemany(sql, rows, db_path=None):
+    with locked():
+        conn = get_connection(db_path)
+        start = time.perf_counter()
+        try:
+            return conn.executemany(sql, rows)
+        finally:
+            _record(sql, time.perf_counter() - start)
+
+
+def fetchall(sql, params=(), db_path=None):
+    with locked():
+        conn = get_connection(db_path)
+        start = time.perf_counter()
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            _record(sql, time.perf_counter() - start)
+
+
+def fetchone(sql, params=(), db_path=None):
+    with locked():
+        conn = get_connection(db_path)
+        start = time.perf_counter()
+        try:
+            return conn.execute(sql, params).fetchone()
+        finally:
+            _record(sql, time.perf_counter() - start)
+
+
+def commit(db_path=None):
+    with locked():
+        conn = get_connection(db_path)
+        start = time.perf_counter()
+        try:
+            conn.commit()
+        finally:
+            _record('COMMIT', time.perf_counter() - start)
+
+
+# Single statement in its own transaction; returns lastrowid
+def write(sql, params=(), db_path=None):
+    with locked():
+        try:
+            cursor = execute(sql, params, db_path)
+            commit(db_path)
+            return cursor.lastrowid
+        except Exception:
+            get_connection(db_path).rollback()
+            raise
+
+
+def init_db(db_path=None):
+    execute('''
+        CREATE TABLE IF NOT EXISTS contact_submissions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            email TEXT NOT NULL,
+            message TEXT NOT NULL,
+            submitted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''', db_path=db_path)
+    # Backs keyset pagination of the submissions viewer
+    execute('''
+        CREATE INDEX IF NOT EXISTS idx_contact_submissions_submitted_at_id
+        ON contact_submissions (submitted_at, id)
+    ''', db_path=db_path)
+    init_search(db_path)
+    # Per-day counts of submissions moved out by retention.py, so totals
+    # still cover archived history
+    execute('''
+        CREATE TABLE IF NOT EXISTS contact_submission_daily (
+            day TEXT PRIMARY KEY,
+            archived INTEGER NOT NULL DEFAULT 0
+        )
+    ''', db_path=db_path)
+    execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL UNIQUE,
+            email TEXT NOT NULL,
+            password TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''', db_path=db_path)
+    # Generated/edited pages; data is a zlib-compressed snapshot (depth 0)
+    # or a delta against parent_id (see revisions.py)
+    execute('''
+        CREATE TABLE IF NOT EXISTS page_revisions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            page_id INTEGER,
+            parent_id INTEGER REFERENCES page_revisions (id),
+            kind TEXT NOT NULL,
+            prompt TEXT,
+            owner TEXT,
+            depth INTEGER NOT NULL,
+            data BLOB NOT NULL,
+            size INTEGER NOT NULL,
+            content_hash TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''', db_path=db_path)
+    execute('''
+        CREATE INDEX IF NOT EXISTS idx_page_revisions_owner_page
+        ON page_revisions (owner, page_id, id)
+    ''', db_path=db_path)
+    execute('''
+        CREATE INDEX IF NOT EXISTS idx_page_revisions_page
+        ON page_revisions (page_id, id)
+    ''', db_path=db_path)
+    commit(db_path)
+    logger.debug("SQLite database initialized successfully.")
+
+
+# FTS5 index over name/email/message for the submissions search. It is an
+# external-content table (no second copy of the text) kept in sync by
+# triggers; rows that predate it are backfilled when it is first created.
+def init_search(db_path=None):
+    exists = fetchone("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'contact_submissions_fts'",
+                      db_path=db_path)
+    if exists:
+        return
+    try:
+        execute('''
+            CREATE VIRTUAL TABLE contact_submissions_fts USING fts5(
+                name, email, message,
+                content='contact_submissions', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2'
+            )
+        ''', db_path=db_path)
+    except sqlite3.OperationalError as e:
+        logger.warning("Full-text search unavailable (%s); submissions search is disabled.", e)
+        return
+    # Matches in the name and email count for more than in the message body
+    execute('''
+        INSERT INTO contact_submissions_fts (contact_submissions_fts, rank) VALUES ('rank', 'bm25(4.0, 4.0, 1.0)')
+    ''', db_path=db_path)
+    execute('''
+        CREATE TRIGGER IF NOT EXISTS contact_submissions_fts_insert AFTER INSERT ON contact_submissions BEGIN
+            INSERT INTO contact_submissions_fts (rowid, name, email, message)
+            VALUES (new.id, new.name, new.email, new.message);
+        END
+    ''', db_path=db_path)
+    execute('''
+        CREATE TRIGGER IF NOT EXISTS contact_submissions_fts_delete AFTER DELETE ON contact_submissions BEGIN
+            INSERT INTO contact_submissions_fts (contact_submissions_fts, rowid, name, email, message)
+            VALUES ('delete', old.id, old.name, old.email, old.message);
+        END
+    ''', db_path=db_path)
+    execute('''
+        CREATE TRIGGER IF NOT EXISTS contact_submissions_fts_update AFTER UPDATE ON contact_submissions BEGIN
+            INSERT INTO contact_submissions_fts (contact_submissions_fts, rowid, name, email, message)
+            VALUES ('delete', old.id, old.name, old.email, old.message);
+            INSERT INTO contact_submissions_fts (rowid, name, email, message)
+            VALUES (new.id, new.name, new.email, new.message);
+        END
+    ''', db_path=db_path)
+    execute("INSERT INTO contact_submissions_fts (contact_submissions_fts) VALUES ('rebuild')", db_path=db_path)
+    logger.info("Built the submissions search index.")
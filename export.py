@@ -0,0 +1,263 @@
+import argparse
+import csv
+import gzip
+import io
+import json
+import logging
+import os
+import sys
+from datetime import datetime, timezone
+
+import db
+import submissions
+
+# pyarrow is optional; without it only CSV and NDJSON are available
+try:
+    import pyarrow
+    import pyarrow.parquet as pq
+except ImportError:
+    pyarrow = None
+
+logger = logging.getLogger(__name__)
+
+# Rows read per fetchmany() call; memory use is bounded by this, not the table
+CHUNK_SIZE = 1000
+# Parquet rows are buffered into row groups of this size
+PARQUET_ROW_GROUP = 50000
+GZIP_LEVEL = 6
+
+FORMATS = ('csv', 'ndjson', 'parquet')
+# csv/ndjson are gzipped as a whole; parquet compresses its column chunks
+COMPRESSIONS = {
+    'csv': ('none', 'gzip'),
+    'ndjson': ('none', 'gzip'),
+    'parquet': ('none', 'snappy', 'gzip', 'zstd'),
+}
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+
+def check_options(fmt, compression):
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format {fmt!r}; expected one of {', '.join(FORMATS)}")
+    if compression not in COMPRESSIONS[fmt]:
+        raise ValueError(f"Compression for {fmt} must be one of {', '.join(COMPRESSIONS[fmt])}")
+    if fmt == 'parquet' and pyarrow is None:
+        raise ValueError("Parquet export needs pyarrow (pip install pyarrow)")
+
+
+# Accept ISO 8601 dates/times and return them in SQLite's CURRENT_TIMESTAMP
+# format (UTC) so they compare correctly with submitted_at
+def parse_time(value):
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc)
+    return parsed.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def filename(fmt, compression):
+    return f"submissions.{fmt}" + ('.gz' if compression == 'gzip' and fmt != 'parquet' else '')
+
+
+# Submissions with id > after_id and submitted_at in [since, until), in id
+# order, as lists of at most chunk_size rows
+def iter_chunks(since=None, until=None, after_id=None, chunk_size=CHUNK_SIZE, db_path=None):
+    clauses, params = ['id > ?'], [after_id or 0]
+    if since:
+        clauses.append('submitted_at >= ?')
+        params.append(since)
+    if until:
+        clauses.append('submitted_at < ?')
+        params.append(until)
+    cursor = db.execute(f'''
+        SELECT id, name, email, message, submitted_at FROM contact_submissions
+        WHERE {' AND '.join(clauses)} ORDER BY id
+    ''', params, db_path)
+    try:
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                return
+            yield rows
+    finally:
+        cursor.close()
+
+
+# Write-only sink that collects output until drained, so an export can be
+# sent to a socket piece by piece
+class _Buffer(io.RawIOBase):
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+# Incremental writer for one export. Tracks the row count and the last id
+# written, which is the cursor for the next incremental export.
+class Exporter:
+    def __init__(self, sink, fmt='csv', compression='none'):
+        check_options(fmt, compression)
+        self.sink = sink
+        self.fmt = fmt
+        self.rows = 0
+        self.last_id = None
+        self._pending = []
+        if fmt == 'parquet':
+            schema = pyarrow.schema([('id', pyarrow.int64()), ('name', pyarrow.string()),
+                                     ('email', pyarrow.string()), ('message', pyarrow.string()),
+                                     ('submitted_at', pyarrow.string())])
+            self._parquet = pq.ParquetWriter(sink, schema, compression=compression)
+        elif compression == 'gzip':
+            self._out = gzip.GzipFile(fileobj=sink, mode='wb', compresslevel=GZIP_LEVEL, mtime=0)
+        else:
+            self._out = sink
+        if fmt == 'csv':
+            self._write_text([], header=True)
+
+    def _write_text(self, rows, header=False):
+        text = io.StringIO()
+        if self.fmt == 'csv':
+            writer = csv.writer(text)
+            if header:
+                writer.writerow(submissions.COLUMNS)
+            writer.writerows(rows)
+        else:
+            for row in rows:
+                text.write(json.dumps(dict(zip(submissions.COLUMNS, row)), ensure_ascii=False))
+                text.write('\n')
+        self._out.write(text.getvalue().encode('utf-8'))
+
+    def _flush_parquet(self):
+        if self._pending:
+            columns = list(zip(*self._pending))
+            self._parquet.write_table(pyarrow.table(
+                {name: list(values) for name, values in zip(submissions.COLUMNS, columns)},
+                schema=self._parquet.schema))
+            self._pending = []
+
+    def write(self, rows):
+        if self.fmt == 'parquet':
+            self._pending.extend(rows)
+            if len(self._pending) >= PARQUET_ROW_GROUP:
+                self._flush_parquet()
+        else:
+            self._write_text(rows)
+        self.rows += len(rows)
+        self.last_id = rows[-1][0]
+
+    def close(self):
+        if self.fmt == 'parquet':
+            self._flush_parquet()
+            self._parquet.close()
+        elif self._out is not self.sink:
+            self._out.close()
+
+
+# Export into a binary file object; returns the Exporter for its stats
+def export(sink, fmt='csv', compression='none', since=None, until=None, after_id=None,
+           chunk_size=CHUNK_SIZE, db_path=None):
+    exporter = Exporter(sink, fmt, compression)
+    for rows in iter_chunks(since, until, after_id, chunk_size, db_path):
+        exporter.write(rows)
+    exporter.close()
+    return exporter
+
+
+# Write one list of rows as a complete document (one gzip member when
+# compressed), e.g. a retention batch appended to an archive file
+def export_rows(sink, rows, fmt='ndjson', compression='none'):
+    exporter = Exporter(sink, fmt, compression)
+    exporter.write(rows)
+    exporter.close()
+    return exporter
+
+
+# Same export as a generator of byte strings, for streaming over HTTP
+def stream(fmt='csv', compression='none', since=None, until=None, after_id=None,
+           chunk_size=CHUNK_SIZE, db_path=None):
+    buffer = _Buffer()
+    exporter = Exporter(buffer, fmt, compression)
+    for rows in iter_chunks(since, until, after_id, chunk_size, db_path):
+        exporter.write(rows)
+        data = buffer.drain()
+        if data:
+            yield data
+    exporter.close()
+    data = buffer.drain()
+    if data:
+        yield data
+
+
+def load_cursor(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f).get('last_id')
+    except FileNotFoundError:
+        return None
+
+
+def save_cursor(path, last_id):
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump({'last_id': last_id}, f)
+    os.replace(tmp, path)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Export contact submissions")
+    parser.add_argument('--format', choices=FORMATS, default='csv')
+    parser.add_argument('--compression', default='none',
+                        help="none or gzip (csv/ndjson); none, snappy, gzip or zstd (parquet)")
+    parser.add_argument('--since', help="Only rows submitted at or after this ISO time")
+    parser.add_argument('--until', help="Only rows submitted before this ISO time")
+    parser.add_argument('--after-id', type=int, help="Only rows with a larger id")
+    parser.add_argument('--state', help="Cursor file: resume after the last exported id and update it on success")
+    parser.add_argument('--output', help="Output file (default: stdout)")
+    parser.add_argument('--db', default=db.DB_PATH)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    try:
+        check_options(args.format, args.compression)
+        since, until = parse_time(args.since), parse_time(args.until)
+    except ValueError as e:
+        parser.error(str(e))
+    after_id = args.after_id
+    if after_id is None and args.state:
+        after_id = load_cursor(args.state)
+
+    if args.output:
+        # Write next to the target and rename, so a failed run leaves neither
+        # a partial file nor an advanced cursor
+        tmp = f"{args.output}.tmp"
+        with open(tmp, 'wb') as f:
+            result = export(f, args.format, args.compression, since, until, after_id, db_path=args.db)
+        os.replace(tmp, args.output)
+    else:
+        result = export(sys.stdout.buffer, args.format, args.compression, since, until, after_id, db_path=args.db)
+        sys.stdout.buffer.flush()
+
+    if args.state and result.last_id is not None:
+        save_cursor(args.state, result.last_id)
+    logger.info("Exported %d rows (last id %s)", result.rows, result.last_id)
@@ -0,0 +1,108 @@
+import collections
+import logging
+import threading
+import time
+
+import llm_backend
+import metrics
+import resilience
+from llm_cache import ResponseCache
+
+logger = logging.getLogger(__name__)
+
+MODEL_NAME = 'gemini-1.5-flash'
+
+response_cache = ResponseCache()
+# Recent streaming timings for measuring perceived latency
+timings = collections.deque(maxlen=100)
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+# Install the backend used for all generate/edit calls. Calls get a
+# deadline, retries and optional hedging, and identical concurrent prompts
+# are coalesced into one upstream call, unless disabled. limiter, if given,
+# is acquired before every upstream request (see resilience.py).
+def set_backend(backend, coalesce=True, resilient=True, limiter=None):
+    global _backend
+    if resilient:
+        backend = resilience.ResilientBackend(backend, limiter=limiter)
+    _backend = llm_backend.CoalescingBackend(backend) if coalesce else backend
+    return _backend
+
+
+# Create the process-wide backend (chosen by LLM_BACKEND) on first use;
+# later calls, e.g. from other Streamlit sessions, reuse it
+def ensure_backend(api_key=None):
+    with _backend_lock:
+        if _backend is None:
+            set_backend(llm_backend.create_backend(api_key=api_key))
+    return _backend
+
+
+def get_backend():
+    return _backend if _backend is not None else ensure_backend()
+
+
+# Run a prompt through the model, serving repeats of the same model, prompt
+# and config from the response cache unless bypass_cache is set. `kind`
+# ('generate' or 'edit') labels the latency metric.
+def generate_text(prompt, model_name=MODEL_NAME, generation_config=None, bypass_cache=False, kind='generate'):
+    start = time.perf_counter()
+    if not bypass_cache:
+        cached = response_cache.get(model_name, prompt, generation_config)
+        if cached is not None:
+            logger.debug("Serving generation from response cache.")
+            metrics.GENERATION_LATENCY.observe(time.perf_counter() - start, kind, 'true')
+            return cached
+    text = get_backend().generate(prompt, model_name, generation_config)
+    metrics.GENERATION_LATENCY.observe(time.perf_counter() - start, kind, 'false')
+    response_cache.put(model_name, prompt, generation_config, text)
+    return text
+
+
+# Streams a generation chunk by chunk. Iterating yields text chunks while
+# `text` accumulates the full output; time_to_first_token and total_time
+# (seconds) are set as the stream progresses.
+class GenerationStream:
+    def __init__(self, prompt, model_name=MODEL_NAME, generation_config=None, bypass_cache=False,
+                 kind='generate'):
+        self.prompt = prompt
+        self.kind = kind
+        self.model_name = model_name
+        self.generation_config = generation_config
+        self.bypass_cache = bypass_cache
+        self.text = ""
+        self.cached = False
+        self.time_to_first_token = None
+        self.total_time = None
+
+    def __iter__(self):
+        start = time.perf_counter()
+        if not self.bypass_cache:
+            cached = response_cache.get(self.model_name, self.prompt, self.generation_config)
+            if cached is not None:
+                self.cached = True
+                self.text = cached
+                self.time_to_first_token = self.total_time = time.perf_counter() - start
+                self._record()
+                yield cached
+                return
+        chunks = []
+        for piece in get_backend().stream(self.prompt, self.model_name, self.generation_config):
+            if self.time_to_first_token is None:
+                self.time_to_first_token = time.perf_counter() - start
+            chunks.append(piece)
+            self.text = "".join(chunks)
+            yield piece
+        self.total_time = time.perf_counter() - start
+        response_cache.put(self.model_name, self.prompt, self.generation_config, self.text)
+        self._record()
+
+    def _record(self):
+        metrics.GENERATION_LATENCY.observe(self.total_time, self.kind, 'true' if self.cached else 'false')
+        timings.append({'time_to_first_token': self.time_to_first_token, 'total_time': self.total_time,
+                        'cached': self.cached, 'chars': len(self.text)})
+        logger.debug("Generation took %.2fs (first token %.2fs, cached=%s)",
+                     self.total_time, self.time_to_first_token or 0, self.cached)
@@ -0,0 +1,66 @@
+import time
+
+import streamlit as st
+
+import generation
+import html_artifact
+
+# Minimum seconds between iframe preview refreshes while streaming
+PREVIEW_REFRESH_INTERVAL = 1.5
+
+
+def _render_preview(placeholder, html):
+    with placeholder.container():
+        st.components.v1.html(html, height=600, scrolling=True)
+
+
+def _render_artifact(code_box, preview_box, artifact, previewed=None):
+    code_box.code(artifact.source, language="html")
+    # Skip re-sending the iframe when the streamed preview already shows this page
+    if artifact.html != previewed:
+        _render_preview(preview_box, artifact.html)
+    st.caption(f"Page: {artifact.summary()}")
+    if artifact.problems:
+        st.warning("HTML may be malformed: " + "; ".join(artifact.problems[:3]))
+
+
+def render_html(html, code_title, preview_title):
+    artifact = html_artifact.process(html)
+    st.subheader(code_title)
+    code_box = st.empty()
+    st.subheader(preview_title)
+    _render_artifact(code_box, st.empty(), artifact)
+    return artifact
+
+
+# Run a generation and render its code and preview. In streaming mode the
+# code panel grows as chunks arrive and the preview refreshes at a throttled
+# rate; returns the post-processed html_artifact.Artifact.
+def render_generation(prompt, code_title, preview_title, stream=True, bypass_cache=False, kind='generate'):
+    st.subheader(code_title)
+    code_box = st.empty()
+    st.subheader(preview_title)
+    preview_box = st.empty()
+
+    if not stream:
+        artifact = html_artifact.process(generation.generate_text(prompt, bypass_cache=bypass_cache, kind=kind))
+        _render_artifact(code_box, preview_box, artifact)
+        return artifact
+
+    result = generation.GenerationStream(prompt, bypass_cache=bypass_cache, kind=kind)
+    last_preview = time.monotonic()
+    previewed = None
+    for _ in result:
+        code_box.code(result.text, language="html")
+        if time.monotonic() - last_preview >= PREVIEW_REFRESH_INTERVAL:
+            partial = html_artifact.minify_html(html_artifact.strip_fences(result.text))
+            if partial != previewed:
+                _render_preview(preview_box, partial)
+                previewed = partial
+            last_preview = time.monotonic()
+    artifact = html_artifact.process(result.text)
+    _render_artifact(code_box, preview_box, artifact, previewed)
+    if result.time_to_first_token is not None:
+        st.caption(f"First chunk after {result.time_to_first_token:.2f}s, "
+                   f"complete after {result.total_time:.2f}s" + (" (cached)" if result.cached else ""))
+    return artifact
@@ -0,0 +1,175 @@
+import functools
+import gzip
+import hashlib
+import re
+from html.parser import HTMLParser
+
+# brotli is optional; without it only gzip variants are produced
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+
+# Elements that never take a closing tag
+VOID_ELEMENTS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'param', 'source',
+                 'track', 'wbr'}
+# Elements whose closing tag may legally be left out
+OPTIONAL_END = {'html', 'head', 'body', 'p', 'li', 'dt', 'dd', 'tr', 'td', 'th', 'thead', 'tbody', 'tfoot',
+                'option', 'optgroup', 'colgroup', 'caption', 'rt', 'rp'}
+
+# A fenced block, possibly cut off at the end of a (streamed) response
+FENCED_BLOCK = re.compile(r'```[ \t]*[\w-]*[ \t]*\r?\n(.*?)(?:```|\Z)', re.S)
+# Elements whose content is whitespace-sensitive or not HTML
+RAW_ELEMENT = re.compile(r'(<(pre|textarea|script|style)\b[^>]*>)(.*?)(</\2\s*>)', re.S | re.I)
+HTML_COMMENT = re.compile(r'<!--(?!\[if).*?-->', re.S)
+CSS_COMMENT = re.compile(r'/\*.*?\*/', re.S)
+CSS_STRING = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')')
+SCRIPT_TYPE = re.compile(r'\btype\s*=\s*["\']?([^"\'\s>]+)', re.I)
+
+
+# Take the HTML out of a model response that wrapped it in markdown fences
+def strip_fences(text):
+    if '```' not in text:
+        return text.strip()
+    blocks = [block for block in FENCED_BLOCK.findall(text) if '<' in block]
+    if not blocks:
+        return text.replace('```', '').strip()
+    return max(blocks, key=len).strip()
+
+
+class _TagChecker(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.stack = []
+        self.problems = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag not in VOID_ELEMENTS:
+            self.stack.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        pass
+
+    def handle_endtag(self, tag):
+        if tag in VOID_ELEMENTS:
+            return
+        line = self.getpos()[0]
+        if tag not in self.stack:
+            self.problems.append(f"Stray </{tag}> on line {line}")
+            return
+        while self.stack[-1] != tag:
+            open_tag = self.stack.pop()
+            if open_tag not in OPTIONAL_END:
+                self.problems.append(f"<{open_tag}> not closed before </{tag}> on line {line}")
+        self.stack.pop()
+
+
+# Problems that would make the page render differently from what was
+# asked for: unbalanced tags, a truncated document. Empty if well-formed.
+def check(html):
+    checker = _TagChecker()
+    checker.feed(html)
+    checker.close()
+    problems = checker.problems
+    problems.extend(f"<{tag}> never closed" for tag in checker.stack if tag not in OPTIONAL_END)
+    if not re.search(r'<html\b', html, re.I):
+        problems.append("No <html> element")
+    return problems
+
+
+def minify_css(css):
+    parts = CSS_STRING.split(CSS_COMMENT.sub('', css))
+    for i in range(0, len(parts), 2):
+        part = re.sub(r'\s+', ' ', parts[i])
+        part = re.sub(r'\s*([{};,>])\s*', r'\1', part)
+        part = re.sub(r':\s+', ':', part)
+        parts[i] = part.replace(';}', '}')
+    return ''.join(parts).strip()
+
+
+# Line-level only: drop indentation, blank lines and whole-line comments.
+# Template literals and backslash-continued strings span lines, so scripts
+# using them are left alone.
+def minify_js(js):
+    if '`' in js or re.search(r'\\[ \t\r]*$', js, re.M):
+        return js.strip()
+    lines = (line.strip() for line in js.splitlines())
+    return '\n'.join(line for line in lines if line and not line.startswith('//'))
+
+
+def _minify_markup(markup):
+    return re.sub(r'\s+', ' ', HTML_COMMENT.sub('', markup))
+
+
+def _minify_raw(match):
+    open_tag, tag, content, close_tag = match.groups()
+    tag = tag.lower()
+    if tag == 'style':
+        content = minify_css(content)
+    elif tag == 'script':
+        script_type = SCRIPT_TYPE.search(open_tag)
+        if not script_type or 'javascript' in script_type.group(1).lower() or script_type.group(1) == 'module':
+            content = minify_js(content)
+    return _minify_markup(open_tag) + content + close_tag
+
+
+# Collapse whitespace and comments in markup and minify inline CSS/JS;
+# <pre> and <textarea> content is kept as is
+def minify_html(html):
+    out = []
+    last = 0
+    for match in RAW_ELEMENT.finditer(html):
+        out.append(_minify_markup(html[last:match.start()]))
+        out.append(_minify_raw(match))
+        last = match.end()
+    out.append(_minify_markup(html[last:]))
+    return ''.join(out).strip()
+
+
+# A generated page after post-processing. source is the readable HTML
+# (shown as code and fed to edits); html/body are the compact page used
+# for preview, download and serving, with precompressed variants.
+class Artifact:
+    def __init__(self, source):
+        self.source = source
+        self.html = minify_html(source)
+        self.body = self.html.encode('utf-8')
+        self.content_hash = hashlib.sha256(self.body).hexdigest()
+        self.etag = f'"{self.content_hash[:32]}"'
+        self.problems = check(source)
+        self.encodings = {'identity': self.body, 'gzip': gzip.compress(self.body, GZIP_LEVEL, mtime=0)}
+        if brotli is not None:
+            self.encodings['br'] = brotli.compress(self.body, quality=BROTLI_QUALITY)
+
+    # Variant for an Accept-Encoding header: (encoding, body, etag). Each
+    # encoding gets its own strong ETag, as the bytes differ.
+    def negotiate(self, accept_encoding):
+        accepted = {}
+        for part in (accept_encoding or '').split(','):
+            coding, _, params = part.partition(';')
+            params = params.strip()
+            try:
+                accepted[coding.strip().lower()] = float(params[2:]) if params.startswith('q=') else 1.0
+            except ValueError:
+                continue
+        for encoding in ('br', 'gzip'):
+            if encoding in self.encodings and accepted.get(encoding, accepted.get('*', 0)) > 0:
+                return encoding, self.encodings[encoding], f'{self.etag[:-1]}-{encoding}"'
+        return 'identity', self.body, self.etag
+
+    def sizes(self):
+        return {encoding: len(data) for encoding, data in self.encodings.items()}
+
+    def summary(self):
+        sizes = ', '.join(f"{encoding} {size / 1024:.1f} KB" for encoding, size in self.sizes().items())
+        return f"{len(self.source.encode('utf-8')) / 1024:.1f} KB source → {sizes} · sha256 {self.content_hash[:12]}"
+
+
+# Post-process a model response. Reruns hand the same text back, so
+# results are memoised rather than minified and compressed again.
+@functools.lru_cache(maxsize=32)
+def process(text):
+    return Artifact(strip_fences(text))
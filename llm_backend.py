@@ -0,0 +1,236 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+
+import metrics
+from llm_cache import cache_key
+
+logger = logging.getLogger(__name__)
+
+# Selected with LLM_BACKEND=gemini|stub; the stub's latency (seconds per
+# call) with LLM_STUB_LATENCY
+DEFAULT_BACKEND = 'gemini'
+DEFAULT_STUB_LATENCY = 0.5
+
+
+# Interface for the model calls behind generate/edit
+class LLMBackend:
+    name = 'base'
+
+    def generate(self, prompt, model_name, generation_config=None):
+        raise NotImplementedError
+
+    # Yields text chunks; backends without streaming return one chunk
+    def stream(self, prompt, model_name, generation_config=None):
+        yield self.generate(prompt, model_name, generation_config)
+
+
+def record_tokens(prompt_tokens, output_tokens):
+    metrics.GENERATION_TOKENS.inc('prompt', amount=prompt_tokens)
+    metrics.GENERATION_TOKENS.inc('output', amount=output_tokens)
+
+
+class GeminiBackend(LLMBackend):
+    name = 'gemini'
+
+    def __init__(self, api_key):
+        self.api_key = api_key
+        self._genai = None
+        self._lock = threading.Lock()
+
+    # google.generativeai is slow to import, so load and configure it on the
+    # first generation rather than at app startup
+    def _client(self):
+        with self._lock:
+            if self._genai is None:
+                import google.generativeai as genai
+                genai.configure(api_key=self.api_key)
+                self._genai = genai
+        return self._genai
+
+    def generate(self, prompt, model_name, generation_config=None):
+        model = self._client().GenerativeModel(model_name, generation_config=generation_config)
+        response = model.generate_content(prompt)
+        self._record_usage(response)
+        return response.text
+
+    def stream(self, prompt, model_name, generation_config=None):
+        model = self._client().GenerativeModel(model_name, generation_config=generation_config)
+        last = None
+        for chunk in model.generate_content(prompt, stream=True):
+            last = chunk
+            if chunk.text:
+                yield chunk.text
+        # The final chunk carries usage for the whole response
+        self._record_usage(last)
+
+    def _record_usage(self, response):
+        usage = getattr(response, 'usage_metadata', None)
+        if usage is not None:
+            record_tokens(getattr(usage, 'prompt_token_count', 0) or 0,
+                          getattr(usage, 'candidates_token_count', 0) or 0)
+
+
+# Deterministic offline backend: the same prompt always yields the same
+# page after a fixed latency, for load tests and benchmarks
+class StubBackend(LLMBackend):
+    name = 'stub'
+
+    def __init__(self, latency=DEFAULT_STUB_LATENCY, chunks=8):
+        self.latency = latency
+        self.chunks = max(1, chunks)
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def render(self, prompt, model_name):
+        digest = hashlib.sha256(f"{model_name}\n{prompt}".encode('utf-8')).hexdigest()
+        return f"""<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="UTF-8">
+<title>Stub page {digest[:8]}</title>
+<style>body {{ font-family: sans-serif; margin: 0; }} nav a {{ margin: 0 8px; }}</style>
+</head>
+<body>
+<header><nav><a href="#home">Home</a><a href="#about">About</a><a href="#contact">Contact</a></nav></header>
+<section id="home"><h1>Stub page {digest[:8]}</h1><p>{len(prompt)} prompt characters.</p></section>
+<section id="about"><p>Generated offline by the stub backend ({digest}).</p></section>
+<section id="contact">
+<form id="contact-form"><input name="name"><input name="email"><textarea name="message"></textarea>
+<button type="submit">Send</button></form>
+</section>
+<footer><p>&copy; 2025 Stub</p></footer>
+<script>
+document.getElementById('contact-form').addEventListener('submit', function (e) {{
+  e.preventDefault();
+  fetch('http://localhost:8000/api/contact', {{method: 'POST', headers: {{'Content-Type': 'application/json'}},
+    body: JSON.stringify(Object.fromEntries(new FormData(e.target)))}});
+}});
+</script>
+</body>
+</html>
+"""
+
+    # Rough 4-characters-per-token estimate so token metrics move offline too
+    def _count(self, prompt, text):
+        with self._lock:
+            self.calls += 1
+        record_tokens(len(prompt) // 4, len(text) // 4)
+
+    def generate(self, prompt, model_name, generation_config=None):
+        text = self.render(prompt, model_name)
+        self._count(prompt, text)
+        time.sleep(self.latency)
+        return text
+
+    def stream(self, prompt, model_name, generation_config=None):
+        text = self.render(prompt, model_name)
+        self._count(prompt, text)
+        size = -(-len(text) // self.chunks)
+        for i in range(0, len(text), size):
+            time.sleep(self.latency / self.chunks)
+            yield text[i:i + size]
+
+
+# One upstream call shared by every caller asking for the same thing
+class _InFlight:
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.cond = threading.Condition()
+
+    def add(self, chunk):
+        with self.cond:
+            self.chunks.append(chunk)
+            self.cond.notify_all()
+
+    def finish(self, error=None):
+        with self.cond:
+            self.done = True
+            self.error = error
+            self.cond.notify_all()
+
+    # Replay chunks as the leader receives them
+    def follow(self):
+        i = 0
+        while True:
+            with self.cond:
+                while i >= len(self.chunks) and not self.done:
+                    self.cond.wait()
+                pending = self.chunks[i:]
+                done, error = self.done, self.error
+            for chunk in pending:
+                yield chunk
+            i += len(pending)
+            if done and i >= len(self.chunks):
+                if error is not None:
+                    raise error
+                return
+
+
+# Coalesces identical concurrent requests (same model, prompt and config)
+# into one call on the wrapped backend; followers share the leader's result
+class CoalescingBackend(LLMBackend):
+    def __init__(self, backend):
+        self.backend = backend
+        self.name = backend.name
+        self.coalesced = 0
+        self._lock = threading.Lock()
+        self._inflight = {}
+
+    def _join(self, key):
+        with self._lock:
+            flight = self._inflight.get(key)
+            if flight is not None:
+                self.coalesced += 1
+                return flight, False
+            flight = self._inflight[key] = _InFlight()
+            return flight, True
+
+    def _release(self, key):
+        with self._lock:
+            self._inflight.pop(key, None)
+
+    def generate(self, prompt, model_name, generation_config=None):
+        return "".join(self.stream(prompt, model_name, generation_config, _streaming=False))
+
+    def stream(self, prompt, model_name, generation_config=None, _streaming=True):
+        key = cache_key(model_name, prompt, generation_config)
+        flight, leader = self._join(key)
+        if not leader:
+            logger.debug("Coalesced identical in-flight generation request.")
+            yield from flight.follow()
+            return
+        try:
+            if _streaming:
+                for chunk in self.backend.stream(prompt, model_name, generation_config):
+                    flight.add(chunk)
+                    yield chunk
+            else:
+                text = self.backend.generate(prompt, model_name, generation_config)
+                flight.add(text)
+                yield text
+        except GeneratorExit:
+            flight.finish(RuntimeError("Coalesced request was abandoned"))
+            raise
+        except BaseException as e:
+            flight.finish(e)
+            raise
+        else:
+            flight.finish()
+        finally:
+            self._release(key)
+
+
+def create_backend(name=None, api_key=None, stub_latency=None):
+    name = name or os.environ.get('LLM_BACKEND', DEFAULT_BACKEND)
+    if name == 'stub':
+        if stub_latency is None:
+            stub_latency = float(os.environ.get('LLM_STUB_LATENCY', DEFAULT_STUB_LATENCY))
+        return StubBackend(latency=stub_latency)
+    if name == 'gemini':
+        return GeminiBackend(api_key)
+    raise ValueError(f"Unknown LLM backend: {name}")
@@ -0,0 +1,132 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+import db
+import metrics
+
+logger = logging.getLogger(__name__)
+
+CACHE_DB_PATH = 'llm_cache.db'
+# Evict least recently used entries once the stored responses exceed this
+MAX_BYTES = int(os.environ.get('LLM_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+# Entries older than this many seconds are dropped (unset = never expire)
+TTL = float(os.environ['LLM_CACHE_TTL']) if os.environ.get('LLM_CACHE_TTL') else None
+
+
+def cache_key(model_name, prompt, generation_config=None):
+    payload = json.dumps({'model': model_name, 'prompt': prompt, 'config': generation_config or {}},
+                         sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+# Content-addressed, size-bounded LRU cache of model responses in SQLite
+class ResponseCache:
+    def __init__(self, db_path=CACHE_DB_PATH, max_bytes=MAX_BYTES, ttl=TTL):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._initialized = False
+        # Running size of the stored responses; only decides when to evict,
+        # and is recounted whenever eviction runs
+        self._total = 0
+
+    def _init(self):
+        if self._initialized:
+            return
+        db.execute('''
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        ''', db_path=self.db_path)
+        db.execute('CREATE INDEX IF NOT EXISTS idx_llm_cache_last_access ON llm_cache (last_access)',
+                   db_path=self.db_path)
+        db.commit(self.db_path)
+        self._total = db.fetchone('SELECT coalesce(sum(size), 0) FROM llm_cache', db_path=self.db_path)[0]
+        self._initialized = True
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        metrics.GENERATION_CACHE.inc('hit' if hit else 'miss')
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses}
+
+    def get(self, model_name, prompt, generation_config=None):
+        self._init()
+        key = cache_key(model_name, prompt, generation_config)
+        row = db.fetchone('SELECT response, created_at, size FROM llm_cache WHERE key = ?', (key,), self.db_path)
+        now = time.time()
+        if row is not None and self.ttl is not None and now - row[1] > self.ttl:
+            with db.locked():
+                removed = db.execute('DELETE FROM llm_cache WHERE key = ? AND created_at = ?', (key, row[1]),
+                                     self.db_path).rowcount
+                db.commit(self.db_path)
+            if removed:
+                with self._lock:
+                    self._total -= row[2]
+            row = None
+        if row is None:
+            self._count(False)
+            return None
+        db.write('UPDATE llm_cache SET last_access = ? WHERE key = ?', (now, key), self.db_path)
+        self._count(True)
+        return row[0]
+
+    def put(self, model_name, prompt, generation_config, response):
+        self._init()
+        key = cache_key(model_name, prompt, generation_config)
+        now = time.time()
+        size = len(response.encode('utf-8'))
+        with db.locked():
+            old = db.fetchone('SELECT size FROM llm_cache WHERE key = ?', (key,), self.db_path)
+            db.write('INSERT OR REPLACE INTO llm_cache (key, model, response, size, created_at, last_access) '
+                     'VALUES (?, ?, ?, ?, ?, ?)', (key, model_name, response, size, now, now), self.db_path)
+        with self._lock:
+            self._total += size - (old[0] if old else 0)
+            over = self._total > self.max_bytes
+        if over:
+            self._evict()
+
+    # Drop expired entries, then the least recently used until under
+    # max_bytes
+    def _evict(self):
+        with db.locked():
+            if self.ttl is not None:
+                db.execute('DELETE FROM llm_cache WHERE created_at < ?', (time.time() - self.ttl,), self.db_path)
+            total = db.fetchone('SELECT coalesce(sum(size), 0) FROM llm_cache', db_path=self.db_path)[0]
+            evicted = 0
+            rows = db.fetchall('SELECT key, size FROM llm_cache ORDER BY last_access',
+                               db_path=self.db_path) if total > self.max_bytes else []
+            for key, size in rows:
+                if total <= self.max_bytes:
+                    break
+                db.execute('DELETE FROM llm_cache WHERE key = ?', (key,), self.db_path)
+                total -= size
+                evicted += 1
+            db.commit(self.db_path)
+            with self._lock:
+                self._total = total
+        logger.debug("Evicted %d cached responses", evicted)
+
+    def clear(self):
+        self._init()
+        db.write('DELETE FROM llm_cache', db_path=self.db_path)
+        with self._lock:
+            self._total = 0
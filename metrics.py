@@ -0,0 +1,152 @@
+import bisect
+import threading
+
+# Minimal in-process metrics in Prometheus text format. Updates take one
+# uncontended lock and a bisect, so they are cheap enough to leave on.
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+GENERATION_BUCKETS = (0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0, 120.0)
+
+REGISTRY = []
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    body = ','.join('%s="%s"' % (k, str(v).replace('\\', '\\\\').replace('"', '\\"')) for k, v in pairs)
+    return '{' + body + '}'
+
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def value(self, *labelvalues):
+        with self._lock:
+            return self._values.get(labelvalues, 0)
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_format_labels(self.labelnames, k)} {v}" for k, v in items]
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+        self._functions = {}
+
+    def set(self, value, *labelvalues):
+        with self._lock:
+            self._values[labelvalues] = value
+
+    # Read the value from fn at scrape time instead of on every change
+    def set_function(self, fn, *labelvalues):
+        with self._lock:
+            self._functions[labelvalues] = fn
+
+    def render(self):
+        with self._lock:
+            values = dict(self._values)
+            functions = dict(self._functions)
+        for labels, fn in functions.items():
+            try:
+                values[labels] = fn()
+            except Exception:
+                continue
+        return self.header() + [f"{self.name}{_format_labels(self.labelnames, k)} {v}"
+                                for k, v in sorted(values.items())]
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._values = {}
+
+    def observe(self, value, *labelvalues):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labelvalues)
+            if entry is None:
+                entry = self._values[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self):
+        with self._lock:
+            items = sorted((k, (list(v[0]), v[1], v[2])) for k, v in self._values.items())
+        lines = self.header()
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, ('le', le))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+def render():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+# Ingestion
+HTTP_REQUESTS = Counter('contact_http_requests_total', 'HTTP requests by path and status code',
+                        ('path', 'status'))
+HTTP_LATENCY = Histogram('contact_http_request_duration_seconds', 'HTTP request latency by path and status code',
+                         ('path', 'status'))
+WRITE_QUEUE_DEPTH = Gauge('contact_write_queue_depth', 'Submissions waiting for the group-commit writer')
+WRITE_BATCH_SIZE = Histogram('contact_write_batch_rows', 'Rows per group-commit batch',
+                             buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500))
+ADMISSION_REJECTED = Counter('contact_admission_rejected_total',
+                             'Submissions turned away with 429 by reason (ip_rate/origin_rate/concurrency)',
+                             ('reason',))
+
+# SQLite
+SQLITE_QUERY_LATENCY = Histogram('sqlite_query_duration_seconds', 'SQLite statement latency by operation',
+                                 ('operation',))
+SQLITE_COMMIT_LATENCY = Histogram('sqlite_commit_duration_seconds', 'SQLite commit latency')
+
+# Generation
+GENERATION_LATENCY = Histogram('generation_duration_seconds', 'Model call latency by kind (generate/edit)',
+                               ('kind', 'cached'), buckets=GENERATION_BUCKETS)
+GENERATION_TOKENS = Counter('generation_tokens_total', 'Model tokens by direction (prompt/output)',
+                            ('direction',))
+GENERATION_CACHE = Counter('generation_cache_requests_total', 'Response cache lookups by result',
+                           ('result',))
@@ -0,0 +1,76 @@
+import collections
+import hashlib
+import hmac
+import secrets
+import threading
+
+import auth
+import html_artifact
+import revisions
+
+# Stored revisions kept in memory after first request; they never change
+REVISION_CACHE_SIZE = 64
+# Sessions/users whose latest pages are held; the least recent is dropped
+LATEST_KEYS = 256
+
+
+# Pages are served under /pages/<key>/, where the key is derived from the
+# pages' owner with auth.SECRET: the same in every session, but not
+# guessable from the owner. Signed-in users own their pages by username;
+# anonymous sessions get a random session_owner().
+def owner_key(owner):
+    return hmac.new(auth.SECRET, f"pages:{owner}".encode('utf-8'), hashlib.sha256).hexdigest()[:32]
+
+
+def session_owner():
+    return f"session:{secrets.token_urlsafe(16)}"
+
+
+# Pages served by the contact server, held as post-processed artifacts
+# (compact HTML plus gzip/brotli variants and a content-hash ETag). Each
+# key (see owner_key) has its own latest generated/edited pages, replaced
+# by publish(); revisions are loaded from SQLite on first request and only
+# served under their owner's key (never, for rows saved without an owner).
+class PageStore:
+    def __init__(self, db_path=None, revision_cache_size=REVISION_CACHE_SIZE, latest_keys=LATEST_KEYS):
+        self.db_path = db_path
+        self.revision_cache_size = revision_cache_size
+        self.latest_keys = latest_keys
+        self._latest = collections.OrderedDict()
+        self._revisions = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def publish(self, key, name, artifact):
+        with self._lock:
+            pages = self._latest.setdefault(key, {})
+            self._latest.move_to_end(key)
+            if artifact is None:
+                pages.pop(name, None)
+            else:
+                pages[name] = artifact
+            if len(self._latest) > self.latest_keys:
+                self._latest.popitem(last=False)
+
+    def latest(self, key, name):
+        with self._lock:
+            return self._latest.get(key, {}).get(name)
+
+    def revision(self, revision_id, key):
+        with self._lock:
+            cached = self._revisions.get(revision_id)
+            if cached is not None:
+                self._revisions.move_to_end(revision_id)
+        if cached is None:
+            try:
+                cached = (revisions.owner(revision_id, self.db_path),
+                          html_artifact.Artifact(revisions.get(revision_id, self.db_path)))
+            except KeyError:
+                return None
+            with self._lock:
+                self._revisions[revision_id] = cached
+                if len(self._revisions) > self.revision_cache_size:
+                    self._revisions.popitem(last=False)
+        owner, artifact = cached
+        if owner is None or not hmac.compare_digest(owner_key(owner), key):
+            return None
+        return artifact
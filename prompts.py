@@ -0,0 +1,33 @@
+# Prompt templates shared by the Streamlit app and the batch generator
+
+GENERATE_TEMPLATE = """
+Generate HTML code for a webpage based on the following description: '{description}'.
+The output should be a complete, valid HTML document with:
+- Proper HTML5 structure
+- Inline CSS in a <style> tag for a clean, modern, responsive design
+- Inline JavaScript in a <script> tag for form submission and navigation functionality
+- No external dependencies or images
+- Return only the HTML code, no explanations or comments
+"""
+
+EDIT_TEMPLATE = """
+You are provided with the following HTML code:
+```
+{html}
+```
+Modify the HTML code based on the following instructions: '{instructions}'.
+Ensure the output is a complete, valid HTML document with:
+- Proper HTML5 structure
+- Inline CSS in a <style> tag
+- Inline JavaScript in a <script> tag, with form submission pointing to 'http://localhost:8000/api/contact'
+- No external dependencies or images
+- Return only the modified HTML code
+"""
+
+
+def generate_prompt(description):
+    return GENERATE_TEMPLATE.format(description=description)
+
+
+def edit_prompt(html, instructions):
+    return EDIT_TEMPLATE.format(html=html, instructions=instructions)
@@ -0,0 +1,194 @@
+import collections
+import functools
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from llm_backend import LLMBackend
+
+logger = logging.getLogger(__name__)
+
+# Whole-call budget in seconds, including retries and hedges
+DEADLINE = float(os.environ.get('LLM_DEADLINE', '60'))
+MAX_ATTEMPTS = 3
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 8.0
+# Hedging: fire a second request once the first has run longer than the
+# observed p95 (or HEDGE_DEFAULT_DELAY until enough samples exist)
+HEDGE = os.environ.get('LLM_HEDGE', '0') == '1'
+HEDGE_MIN_SAMPLES = 20
+HEDGE_DEFAULT_DELAY = 15.0
+
+# google.api_core exception names worth retrying (429/500/503/504)
+RETRYABLE_ERRORS = {'ResourceExhausted', 'TooManyRequests', 'ServiceUnavailable', 'InternalServerError',
+                    'DeadlineExceeded', 'GatewayTimeout', 'Aborted', 'RetryError'}
+
+# Calls run here so a hung request can be abandoned at its deadline
+_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix='llm-call')
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+def is_retryable(error):
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    return type(error).__name__ in RETRYABLE_ERRORS or getattr(error, 'code', None) in (429, 500, 503, 504)
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_CAP):
+    # Full jitter: uniform in [0, min(cap, base * 2^attempt)]
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def _discard_result(discard, future):
+    if future.exception() is None:
+        discard(future.result())
+
+
+def _close(iterator):
+    close = getattr(iterator, 'close', None)
+    if close is not None:
+        close()
+
+
+# Wraps a backend with a per-call deadline, retries with exponential
+# backoff and jitter, and optional hedged requests. limiter (anything with
+# acquire(timeout) -> bool, e.g. batch_generate.RateLimiter) is taken
+# before every upstream request, retries and hedges included, and never
+# waited on past the deadline.
+class ResilientBackend(LLMBackend):
+    def __init__(self, backend, deadline=DEADLINE, max_attempts=MAX_ATTEMPTS, hedge=HEDGE, limiter=None):
+        self.backend = backend
+        self.limiter = limiter
+        self.name = backend.name
+        self.deadline = deadline
+        self.max_attempts = max_attempts
+        self.hedge = hedge
+        self.retries = 0
+        self.hedges = 0
+        # Recent latencies per call kind (full generate vs first stream chunk)
+        self._latencies = collections.defaultdict(lambda: collections.deque(maxlen=200))
+        self._lock = threading.Lock()
+
+    def hedge_delay(self, kind):
+        with self._lock:
+            samples = sorted(self._latencies[kind])
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return HEDGE_DEFAULT_DELAY
+        return samples[int(len(samples) * 0.95) - 1]
+
+    def _timed(self, kind, fn, *args):
+        start = time.perf_counter()
+        result = fn(*args)
+        with self._lock:
+            self._latencies[kind].append(time.perf_counter() - start)
+        return result
+
+    def _timeout(self):
+        return DeadlineExceeded(f"Generation timed out after {self.deadline:g}s")
+
+    # None if the limiter has no slot before the deadline
+    def _submit(self, kind, fn, args, deadline_at):
+        if self.limiter is not None and not self.limiter.acquire(timeout=deadline_at - time.monotonic()):
+            return None
+        return _executor.submit(self._timed, kind, fn, *args)
+
+    # Results of attempts that lost (to a hedge, or to the deadline) are
+    # passed to discard once they arrive, e.g. to close a stream
+    def _attempt(self, kind, fn, args, deadline_at, discard=None):
+        remaining = deadline_at - time.monotonic()
+        if remaining <= 0:
+            raise self._timeout()
+        future = self._submit(kind, fn, args, deadline_at)
+        if future is None:
+            raise self._timeout()
+        futures = [future]
+        if self.hedge:
+            done, _ = wait(futures, timeout=min(self.hedge_delay(kind), remaining))
+            if not done:
+                # Without a rate limit slot in time, keep waiting on the primary
+                hedge = self._submit(kind, fn, args, deadline_at)
+                if hedge is not None:
+                    with self._lock:
+                        self.hedges += 1
+                    logger.debug("Primary generation slow, sending hedged request.")
+                    futures.append(hedge)
+        winner = None
+        error = None
+        pending = set(futures)
+        while pending and winner is None:
+            remaining = deadline_at - time.monotonic()
+            done, pending = wait(pending, timeout=max(remaining, 0), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                if future.exception() is None:
+                    if winner is None:
+                        winner = future
+                    elif discard is not None:
+                        discard(future.result())
+                else:
+                    error = future.exception()
+        if discard is not None:
+            for future in pending:
+                future.add_done_callback(functools.partial(_discard_result, discard))
+        if winner is not None:
+            return winner.result()
+        if error is not None and not pending:
+            raise error
+        raise self._timeout()
+
+    def _call(self, kind, fn, args, deadline_at, discard=None):
+        for attempt in range(self.max_attempts):
+            try:
+                return self._attempt(kind, fn, args, deadline_at, discard)
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                if not is_retryable(e) or attempt == self.max_attempts - 1:
+                    raise
+                delay = backoff_delay(attempt)
+                if time.monotonic() + delay >= deadline_at:
+                    raise
+                with self._lock:
+                    self.retries += 1
+                logger.warning("Retryable generation error (%s: %s), retrying in %.2fs", type(e).__name__, e, delay)
+                time.sleep(delay)
+
+    def generate(self, prompt, model_name, generation_config=None):
+        deadline_at = time.monotonic() + self.deadline
+        return self._call('generate', self.backend.generate, (prompt, model_name, generation_config), deadline_at)
+
+    # Retries and hedges cover the wait for the first chunk; once output has
+    # been shown the stream only enforces the deadline
+    def stream(self, prompt, model_name, generation_config=None):
+        def first_chunk():
+            iterator = iter(self.backend.stream(prompt, model_name, generation_config))
+            return iterator, next(iterator, None)
+
+        deadline_at = time.monotonic() + self.deadline
+        iterator, chunk = self._call('stream', first_chunk, (), deadline_at,
+                                     discard=lambda result: _close(result[0]))
+        in_flight = None
+        try:
+            while chunk is not None:
+                yield chunk
+                remaining = deadline_at - time.monotonic()
+                future = _executor.submit(next, iterator, None)
+                done, _ = wait([future], timeout=max(remaining, 0))
+                if not done:
+                    in_flight = future
+                    raise self._timeout()
+                chunk = future.result()
+        finally:
+            # A next() still running in the executor can't be interrupted;
+            # the stream is closed once it returns
+            if in_flight is not None:
+                in_flight.add_done_callback(lambda future: _close(iterator))
+            else:
+                _close(iterator)
@@ -0,0 +1,201 @@
+import argparse
+import collections
+import logging
+import os
+import threading
+import time
+
+import db
+import export
+import submissions
+
+logger = logging.getLogger(__name__)
+
+# Rows older than this many days leave the hot table; 0 disables the
+# background job
+RETENTION_DAYS = int(os.environ.get('CONTACT_RETENTION_DAYS', '0'))
+ARCHIVE_DB_PATH = 'submissions_archive.db'
+# Rows moved per transaction, and the pause between batches, so the
+# group-commit writer never waits long for the write lock
+BATCH_SIZE = 500
+BATCH_PAUSE = 0.05
+# Pages released per incremental_vacuum step
+VACUUM_STEP_PAGES = 2000
+RUN_INTERVAL = 24 * 60 * 60
+
+SELECT_BATCH_SQL = '''
+    SELECT id, name, email, message, submitted_at FROM contact_submissions
+    WHERE submitted_at < ? ORDER BY submitted_at, id LIMIT ?
+'''
+
+
+def init_archive_db(path):
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS contact_submissions (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            email TEXT NOT NULL,
+            message TEXT NOT NULL,
+            submitted_at TIMESTAMP
+        )
+    ''', db_path=path)
+    db.commit(path)
+
+
+# Archive target: rows go to a separate SQLite database. INSERT OR IGNORE on
+# the original id makes a batch safe to repeat if the job died between
+# archiving it and deleting it from the hot table.
+class DatabaseArchive:
+    def __init__(self, path=ARCHIVE_DB_PATH):
+        self.path = path
+        init_archive_db(path)
+
+    def write(self, rows):
+        db.executemany('INSERT OR IGNORE INTO contact_submissions VALUES (?, ?, ?, ?, ?)', rows, self.path)
+        db.commit(self.path)
+
+    def close(self):
+        pass
+
+
+# Archive target: gzipped NDJSON, one file per run. Each batch is appended as
+# its own gzip member and synced before the rows are deleted.
+class FileArchive:
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, time.strftime('submissions-%Y%m%d-%H%M%S.ndjson.gz'))
+
+    def write(self, rows):
+        with open(self.path, 'ab') as f:
+            export.export_rows(f, rows, 'ndjson', 'gzip')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def close(self):
+        pass
+
+
+def _cutoff(days):
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(time.time() - days * 86400))
+
+
+# Move one batch: archive it, then record per-day counts and delete it from
+# the hot table in a single transaction. Returns the number of rows moved.
+def move_batch(archive, cutoff, batch_size=BATCH_SIZE, db_path=None):
+    rows = db.fetchall(SELECT_BATCH_SQL, (cutoff, batch_size), db_path)
+    if not rows:
+        return 0
+    archive.write(rows)
+    per_day = collections.Counter(str(row[4])[:10] for row in rows)
+    with db.locked():
+        try:
+            db.executemany('''
+                INSERT INTO contact_submission_daily (day, archived) VALUES (?, ?)
+                ON CONFLICT (day) DO UPDATE SET archived = archived + excluded.archived
+            ''', list(per_day.items()), db_path)
+            db.executemany('DELETE FROM contact_submissions WHERE id = ?', [(row[0],) for row in rows], db_path)
+            db.commit(db_path)
+        except Exception:
+            db.get_connection(db_path).rollback()
+            raise
+    return len(rows)
+
+
+def incremental_vacuum_enabled(db_path=None):
+    return db.fetchone('PRAGMA auto_vacuum', db_path=db_path)[0] == 2
+
+
+# Databases created before auto_vacuum was enabled need one full VACUUM to
+# switch modes. It rewrites the whole file under the write lock, so it is
+# only run on request from the CLI (--convert), never by the background job.
+def ensure_incremental_vacuum(db_path=None):
+    if not incremental_vacuum_enabled(db_path):
+        logger.info("Enabling incremental auto_vacuum (one-time VACUUM).")
+        db.execute('PRAGMA auto_vacuum = INCREMENTAL', db_path=db_path)
+        db.execute('VACUUM', db_path=db_path)
+
+
+# Release free pages a few at a time, so writers only ever wait for one step
+def reclaim_space(db_path=None, step_pages=VACUUM_STEP_PAGES, pause=BATCH_PAUSE):
+    if incremental_vacuum_enabled(db_path):
+        while db.fetchone('PRAGMA freelist_count', db_path=db_path)[0]:
+            db.fetchall(f'PRAGMA incremental_vacuum({int(step_pages)})', db_path=db_path)
+            time.sleep(pause)
+    else:
+        logger.warning("auto_vacuum is not INCREMENTAL on %s; freed pages are reused but not returned to the "
+                       "filesystem. Stop ingestion and run 'python retention.py --convert' once to switch.",
+                       db_path or db.DB_PATH)
+    # Fold the search index segments left by the deletes (bounded work)
+    if db.fetchone("SELECT 1 FROM sqlite_master WHERE name = 'contact_submissions_fts'", db_path=db_path):
+        db.execute("INSERT INTO contact_submissions_fts (contact_submissions_fts, rank) VALUES ('merge', 500)",
+                   db_path=db_path)
+        db.commit(db_path)
+    db.fetchone('PRAGMA wal_checkpoint(TRUNCATE)', db_path=db_path)
+
+
+# One retention pass: move everything older than `days` in batches, then
+# give the freed pages back to the filesystem. Returns the rows moved.
+def run(days, archive, batch_size=BATCH_SIZE, pause=BATCH_PAUSE, db_path=None, stop=None):
+    cutoff = _cutoff(days)
+    moved = 0
+    while stop is None or not stop.is_set():
+        count = move_batch(archive, cutoff, batch_size, db_path)
+        moved += count
+        if count < batch_size:
+            break
+        time.sleep(pause)
+    archive.close()
+    if moved:
+        submissions.invalidate_count(db_path)
+        reclaim_space(db_path)
+    logger.info("Retention moved %d submissions older than %s", moved, cutoff)
+    return moved
+
+
+# Runs a retention pass every RUN_INTERVAL seconds on a daemon thread
+class RetentionJob:
+    def __init__(self, days=RETENTION_DAYS, archive_path=ARCHIVE_DB_PATH, db_path=None, interval=RUN_INTERVAL):
+        self.days = days
+        self.archive_path = archive_path
+        self.db_path = db_path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="retention", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=10):
+        self._stop.set()
+        self._thread.join(timeout)
+
+    def _run(self):
+        db.use_own_connection()
+        while not self._stop.is_set():
+            try:
+                run(self.days, DatabaseArchive(self.archive_path), db_path=self.db_path, stop=self._stop)
+            except Exception as e:
+                logger.error("Retention run failed: %s", e)
+            self._stop.wait(self.interval)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Archive old contact submissions and compact the database")
+    parser.add_argument('--days', type=int, default=RETENTION_DAYS or 90, help="Keep this many days in the hot table")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument('--archive-db', default=ARCHIVE_DB_PATH, help="Archive into this SQLite database")
+    target.add_argument('--archive-dir', help="Archive into gzipped NDJSON files in this directory instead")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--convert', action='store_true',
+                        help="First switch an older database to incremental auto_vacuum with a one-time full VACUUM "
+                             "(blocks writers for its duration; stop ingestion first)")
+    parser.add_argument('--db', default=db.DB_PATH)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    db.init_db(args.db)
+    if args.convert:
+        ensure_incremental_vacuum(args.db)
+    archive = FileArchive(args.archive_dir) if args.archive_dir else DatabaseArchive(args.archive_db)
+    run(args.days, archive, args.batch_size, db_path=args.db)
@@ -0,0 +1,127 @@
+import difflib
+import functools
+import hashlib
+import json
+import zlib
+
+import db
+
+# Every SNAPSHOT_EVERY-th revision in a chain stores the full page, so a
+# reconstruction applies at most SNAPSHOT_EVERY - 1 deltas
+SNAPSHOT_EVERY = 10
+COMPRESS_LEVEL = 6
+HISTORY_LIMIT = 20
+
+
+def _pack(value):
+    return zlib.compress(json.dumps(value, separators=(',', ':')).encode('utf-8'), COMPRESS_LEVEL)
+
+
+def _unpack(data):
+    return json.loads(zlib.decompress(data).decode('utf-8'))
+
+
+# Line-level delta from parent to text: [start, end] copies parent lines,
+# a string is inserted as is. Unchanged lines cost a few bytes, so the
+# delta grows with the size of the change, not the page.
+def make_delta(parent, text):
+    old = parent.splitlines(keepends=True)
+    new = text.splitlines(keepends=True)
+    ops = []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, old, new, autojunk=False).get_opcodes():
+        if tag == 'equal':
+            ops.append([i1, i2])
+        elif j2 > j1:
+            ops.append(''.join(new[j1:j2]))
+    return ops
+
+
+def apply_delta(parent, ops):
+    old = parent.splitlines(keepends=True)
+    return ''.join(''.join(old[op[0]:op[1]]) if isinstance(op, list) else op for op in ops)
+
+
+# Store a generate/edit result as a child of parent_id (None starts a new
+# page). Returns the revision id; saving a page identical to its parent
+# returns the parent's id.
+def save(text, kind, parent_id=None, prompt=None, owner=None, db_path=None):
+    content_hash = hashlib.sha256(text.encode('utf-8')).hexdigest()
+    parent = None
+    if parent_id is not None:
+        parent = db.fetchone('SELECT page_id, depth, content_hash FROM page_revisions WHERE id = ?',
+                             (parent_id,), db_path)
+        if parent is None:
+            raise ValueError(f"Unknown revision {parent_id}")
+        if parent[2] == content_hash:
+            return parent_id
+
+    data, depth = _pack(text), 0
+    if parent is not None and parent[1] + 1 < SNAPSHOT_EVERY:
+        delta = _pack(make_delta(get(parent_id, db_path), text))
+        # A rewrite can make the delta bigger than the page itself
+        if len(delta) < len(data):
+            data, depth = delta, parent[1] + 1
+
+    with db.locked():
+        try:
+            cursor = db.execute('''
+                INSERT INTO page_revisions (page_id, parent_id, kind, prompt, owner, depth, data, size, content_hash)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (parent[0] if parent else None, parent_id, kind, prompt, owner, depth, data, len(data),
+                  content_hash), db_path)
+            revision_id = cursor.lastrowid
+            if parent is None:
+                db.execute('UPDATE page_revisions SET page_id = id WHERE id = ?', (revision_id,), db_path)
+            db.commit(db_path)
+        except Exception:
+            db.get_connection(db_path).rollback()
+            raise
+    return revision_id
+
+
+# Full text of a revision: the nearest snapshot plus the deltas after it,
+# fetched in one query. Revisions never change, so results are memoised.
+@functools.lru_cache(maxsize=64)
+def get(revision_id, db_path=None):
+    chain = db.fetchall('''
+        WITH RECURSIVE chain (id, parent_id, depth, data, n) AS (
+            SELECT id, parent_id, depth, data, 0 FROM page_revisions WHERE id = ?
+            UNION ALL
+            SELECT r.id, r.parent_id, r.depth, r.data, chain.n + 1
+            FROM page_revisions r JOIN chain ON r.id = chain.parent_id
+            WHERE chain.depth > 0
+        )
+        SELECT depth, data FROM chain ORDER BY n DESC
+    ''', (revision_id,), db_path)
+    if not chain:
+        raise KeyError(f"Unknown revision {revision_id}")
+    text = _unpack(chain[0][1])
+    for _, data in chain[1:]:
+        text = apply_delta(text, _unpack(data))
+    return text
+
+
+def owner(revision_id, db_path=None):
+    row = db.fetchone('SELECT owner FROM page_revisions WHERE id = ?', (revision_id,), db_path)
+    if row is None:
+        raise KeyError(f"Unknown revision {revision_id}")
+    return row[0]
+
+
+# Most recently changed pages: (page_id, latest revision id, revisions,
+# first prompt, last change)
+def recent_pages(owner=None, limit=HISTORY_LIMIT, db_path=None):
+    return db.fetchall('''
+        SELECT r.page_id, max(r.id), count(*), p.prompt, max(r.created_at)
+        FROM page_revisions r JOIN page_revisions p ON p.id = r.page_id
+        WHERE r.owner IS ?
+        GROUP BY r.page_id ORDER BY max(r.id) DESC LIMIT ?
+    ''', (owner, limit), db_path)
+
+
+# Revisions of one page, newest first: (id, parent_id, kind, prompt, size, created_at)
+def history(page_id, db_path=None):
+    return db.fetchall('''
+        SELECT id, parent_id, kind, prompt, size, created_at FROM page_revisions
+        WHERE page_id = ? ORDER BY id DESC
+    ''', (page_id,), db_path)
@@ -0,0 +1,36 @@
+import streamlit as st
+
+import revisions
+from generation_view import render_html
+
+
+# Browse saved pages and their revisions. "Continue from this revision"
+# makes the chosen revision the base for the next edit; with pages_url (the
+# contact server's /pages/<key> for this session) set, each revision links
+# to its copy there.
+def render_history(owner=None, key="history", pages_url=None):
+    pages = revisions.recent_pages(owner)
+    if not pages:
+        st.write("No saved pages yet.")
+        return
+
+    page_labels = {page_id: f"Page {page_id} · {count} revisions · {(prompt or '').strip()[:60]}"
+                   for page_id, _, count, prompt, _ in pages}
+    page_id = st.selectbox("Page", list(page_labels), format_func=page_labels.get, key=f"{key}_page")
+    rows = revisions.history(page_id)
+    revision_labels = {row_id: f"#{row_id} {kind} · {created_at} · {size} B stored"
+                       + (f" · {prompt.strip()[:60]}" if prompt and kind == 'edit' else "")
+                       for row_id, _, kind, prompt, size, created_at in rows}
+    revision_id = st.selectbox("Revision", list(revision_labels), format_func=revision_labels.get,
+                               key=f"{key}_revision")
+
+    text = revisions.get(revision_id)
+    if pages_url:
+        st.markdown(f"[Open revision #{revision_id}]({pages_url}/revisions/{revision_id}.html)")
+    if st.button("Continue from this revision", key=f"{key}_continue"):
+        st.session_state.generated_html = text
+        st.session_state.edited_html = ""
+        st.session_state.revision_id = revision_id
+        st.success(f"Next edit will start from revision #{revision_id}.")
+    if st.checkbox("Show this revision", key=f"{key}_show"):
+        render_html(text, f"Revision #{revision_id} HTML Code", f"Revision #{revision_id} Preview")
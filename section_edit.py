@@ -0,0 +1,186 @@
+import logging
+import re
+
+import generation
+
+logger = logging.getLogger(__name__)
+
+# Elements the page is split into; each becomes an addressable region
+REGION_TAGS = ('section', 'style', 'script', 'nav', 'footer')
+# Send at most this many regions; broader edits fall back to a full rewrite
+MAX_REGIONS = 3
+# Tags whose open/close balance must survive an edit
+BALANCED_TAGS = ('html', 'head', 'body', 'section', 'nav', 'footer', 'style', 'script', 'div', 'form', 'ul')
+
+# Extra words that point an instruction at a region kind
+KIND_HINTS = {
+    'style': ('color', 'colour', 'font', 'background', 'css', 'style', 'theme', 'layout', 'responsive',
+              'hover', 'padding', 'margin', 'border', 'animation', 'dark', 'light', 'pastel', 'size'),
+    'script': ('javascript', 'js', 'script', 'click', 'submit', 'submission', 'toggle', 'hamburger',
+               'fetch', 'validation', 'validate', 'alert', 'scroll'),
+    'nav': ('nav', 'navigation', 'navbar', 'menu', 'link', 'links', 'hamburger', 'header'),
+    'footer': ('footer', 'copyright', 'social', 'bottom'),
+}
+
+REGION_MARKER = re.compile(r'<<<REGION (\S+)>>>\s*\n(.*?)\n?<<<END>>>', re.S)
+
+
+class Region:
+    __slots__ = ('key', 'tag', 'element_id', 'start', 'end')
+
+    def __init__(self, key, tag, element_id, start, end):
+        self.key = key
+        self.tag = tag
+        self.element_id = element_id
+        self.start = start
+        self.end = end
+
+    def source(self, html):
+        return html[self.start:self.end]
+
+
+def _find_close(html, tag, pos):
+    # Matching close tag, allowing nested elements of the same kind
+    depth = 1
+    pattern = re.compile(rf'<(/?){tag}\b[^>]*>', re.I)
+    for m in pattern.finditer(html, pos):
+        depth += -1 if m.group(1) else 1
+        if depth == 0:
+            return m.end()
+    return None
+
+
+# Split the page into non-overlapping regions, in document order
+def parse_regions(html):
+    found = []
+    for tag in REGION_TAGS:
+        for m in re.finditer(rf'<{tag}\b([^>]*)>', html, re.I):
+            end = _find_close(html, tag, m.end())
+            if end is None:
+                continue
+            id_match = re.search(r'\bid\s*=\s*["\']([^"\']+)["\']', m.group(1))
+            found.append((m.start(), end, tag, id_match.group(1) if id_match else None))
+    found.sort()
+
+    regions = []
+    counters = {}
+    last_end = -1
+    for start, end, tag, element_id in found:
+        if start < last_end:
+            continue
+        counters[tag] = counters.get(tag, 0) + 1
+        key = f"{tag}#{element_id}" if element_id else f"{tag}[{counters[tag]}]"
+        regions.append(Region(key, tag, element_id, start, end))
+        last_end = end
+    return regions
+
+
+# One line per region so the model sees the whole page structure cheaply
+def outline(html, regions):
+    lines = []
+    for region in regions:
+        text = re.sub(r'<[^>]+>', ' ', region.source(html))
+        text = ' '.join(text.split())[:80]
+        lines.append(f"- {region.key} ({region.end - region.start} chars): {text}")
+    return '\n'.join(lines)
+
+
+def _words(text):
+    return set(re.findall(r'[a-z0-9]+', text.lower()))
+
+
+# Regions the instruction most likely touches, best first
+def select_regions(instruction, html, regions, limit=MAX_REGIONS):
+    words = _words(instruction)
+    scored = []
+    for region in regions:
+        score = 0
+        if region.element_id and region.element_id.lower() in words:
+            score += 5
+        # "section" alone does not say which section
+        if region.tag != 'section' and region.tag in words:
+            score += 3
+        score += 2 * len(words & set(KIND_HINTS.get(region.tag, ())))
+        # Instruction quotes text that appears in this region
+        region_words = _words(region.source(html))
+        score += len({w for w in words if len(w) > 4} & region_words)
+        if score:
+            scored.append((score, region.start, region))
+    scored.sort(key=lambda item: (-item[0], item[1]))
+    if not scored:
+        return []
+    # Drop weak matches that ride along with a clear best match
+    cutoff = scored[0][0] / 2
+    return [region for score, _, region in scored[:limit] if score >= cutoff]
+
+
+def build_prompt(instruction, html, regions, selected):
+    blocks = '\n'.join(f"<<<REGION {r.key}>>>\n{r.source(html)}\n<<<END>>>" for r in selected)
+    return f"""
+    You are editing part of an HTML page. Page outline:
+    {outline(html, regions)}
+
+    These are the regions you may change:
+    {blocks}
+
+    Apply the following instructions: '{instruction}'.
+    Return ONLY the changed regions, each in exactly this format:
+    <<<REGION key>>>
+    ...complete replacement element...
+    <<<END>>>
+    Keep each element's tag and id. Do not return regions you did not change and add no explanations.
+    """
+
+
+def parse_replacements(text):
+    return {key: body.strip() for key, body in REGION_MARKER.findall(text)}
+
+
+def _tag_balance(html):
+    lowered = html.lower()
+    return {tag: len(re.findall(rf'<{tag}\b', lowered)) - lowered.count(f'</{tag}>') for tag in BALANCED_TAGS}
+
+
+def splice(html, regions, replacements):
+    by_key = {r.key: r for r in regions}
+    for key in replacements:
+        if key not in by_key:
+            raise ValueError(f"Unknown region {key}")
+    result = html
+    for region in sorted((by_key[k] for k in replacements), key=lambda r: r.start, reverse=True):
+        result = result[:region.start] + replacements[region.key] + result[region.end:]
+    return result
+
+
+def validate(original, edited, regions, replacements):
+    by_key = {r.key: r for r in regions}
+    for key, body in replacements.items():
+        region = by_key[key]
+        if not re.match(rf'<{region.tag}\b', body, re.I) or not body.lower().endswith(f'</{region.tag}>'):
+            return False
+        if region.element_id and region.element_id not in body[:body.find('>') + 1]:
+            return False
+    return _tag_balance(edited) == _tag_balance(original)
+
+
+# Edit only the regions the instruction touches and splice them back in.
+# Falls back to full_edit_prompt (a whole-document edit) when no region
+# matches or the spliced page fails validation. Returns (html, mode).
+def edit_page(html, instruction, full_edit_prompt, bypass_cache=False):
+    regions = parse_regions(html)
+    selected = select_regions(instruction, html, regions)
+    if selected:
+        try:
+            response = generation.generate_text(build_prompt(instruction, html, regions, selected),
+                                                bypass_cache=bypass_cache, kind='edit')
+            replacements = parse_replacements(response)
+            if replacements:
+                # Only regions the model was shown may be replaced
+                edited = splice(html, selected, replacements)
+                if validate(html, edited, selected, replacements):
+                    logger.debug("Section edit replaced %s", ', '.join(replacements))
+                    return edited, 'sections'
+            logger.warning("Section edit failed validation, falling back to full edit.")
+        except Exception as e:
+            logger.warning("Section edit error, falling back to full edit: %s", e)
+    return generation.generate_text(full_edit_prompt, bypass_cache=bypass_cache, kind='edit'), 'full'
@@ -0,0 +1,144 @@
+import re
+import threading
+
+import db
+
+COLUMNS = ['id', 'name', 'email', 'message', 'submitted_at']
+PAGE_SIZE = 50
+SEARCH_COLUMNS = ['id', 'name', 'email', 'submitted_at', 'snippet']
+# Searches rank matches in windows of up to this many, newest first, so a
+# very common term never scores (or counts) millions of rows at once
+SEARCH_CANDIDATES = 5000
+MAX_ROWID = 2 ** 63 - 1
+# Marks the matched terms in snippets; the viewer turns them into bold text
+HIGHLIGHT_START = '\x02'
+HIGHLIGHT_END = '\x03'
+
+_count_lock = threading.Lock()
+# {db_path: (max_id, min_id, count)}
+_count_cache = {}
+
+
+# Forget the cached total; called after deletes (inserts are picked up by
+# total_count on its own)
+def invalidate_count(db_path=None):
+    with _count_lock:
+        _count_cache.pop(db_path or db.DB_PATH, None)
+
+
+# Total row count, kept up to date incrementally. max(id) and min(id) are
+# rowid lookups: new rows (from any process) are counted with a rowid range
+# scan past the cached max(id), so the cost follows the number of new rows,
+# not the table. Only a change in min(id), i.e. retention deleting old
+# rows, forces a full recount.
+def total_count(db_path=None):
+    key = db_path or db.DB_PATH
+    max_id, min_id = db.fetchone('''
+        SELECT (SELECT max(id) FROM contact_submissions), (SELECT min(id) FROM contact_submissions)
+    ''', db_path=db_path)
+    with _count_lock:
+        cached = _count_cache.get(key)
+    if cached is not None and cached[0] == max_id and cached[1] == min_id:
+        return cached[2]
+    grown = (cached is not None and cached[1] == min_id and cached[0] is not None
+             and max_id is not None and max_id > cached[0])
+    if grown:
+        added, new_max = db.fetchone('SELECT count(*), max(id) FROM contact_submissions WHERE id > ?',
+                                     (cached[0],), db_path)
+        count, max_id = cached[2] + added, new_max
+    else:
+        count, max_id, min_id = db.fetchone('SELECT count(*), max(id), min(id) FROM contact_submissions',
+                                            db_path=db_path)
+    with _count_lock:
+        _count_cache[key] = (max_id, min_id, count)
+    return count
+
+
+# Submissions moved to the archive by retention.py
+def archived_count(db_path=None):
+    return db.fetchone('SELECT coalesce(sum(archived), 0) FROM contact_submission_daily', db_path=db_path)[0]
+
+
+# (day, submissions) for the last `days` days, archived and live combined
+def daily_counts(days=30, db_path=None):
+    return db.fetchall('''
+        SELECT day, sum(n) FROM (
+            SELECT day, archived AS n FROM contact_submission_daily WHERE day >= date('now', ?)
+            UNION ALL
+            SELECT date(submitted_at), count(*) FROM contact_submissions
+            WHERE submitted_at >= date('now', ?) GROUP BY 1
+        ) GROUP BY day ORDER BY day
+    ''', (f'-{days} days', f'-{days} days'), db_path)
+
+
+# Newest-first keyset pagination on (submitted_at, id). `after` is the
+# (submitted_at, id) of the last row of the previous page. Returns the rows
+# and the cursor for the next page (None on the last page).
+def fetch_page(after=None, page_size=PAGE_SIZE, db_path=None):
+    if after is None:
+        rows = db.fetchall('''
+            SELECT id, name, email, message, submitted_at FROM contact_submissions
+            ORDER BY submitted_at DESC, id DESC LIMIT ?
+        ''', (page_size + 1,), db_path)
+    else:
+        rows = db.fetchall('''
+            SELECT id, name, email, message, submitted_at FROM contact_submissions
+            WHERE (submitted_at, id) < (?, ?)
+            ORDER BY submitted_at DESC, id DESC LIMIT ?
+        ''', (after[0], after[1], page_size + 1), db_path)
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = (rows[-1][4], rows[-1][0])
+    return rows, next_cursor
+
+
+# Turn free text into an FTS5 query: every word must match (quoted, so
+# punctuation such as the @ in an email is safe), the last one as a prefix
+# so results appear while typing
+def search_query(text):
+    terms = [t.replace('"', '""') for t in re.findall(r'\S+', text)]
+    if not terms:
+        return None
+    return ' '.join(f'"{t}"' for t in terms) + '*'
+
+
+# A candidate window for a search: (matches, smallest rowid) over the
+# newest SEARCH_CANDIDATES matches with rowid < before (all when None). FTS5
+# walks its doclists in rowid order, so this stops after the window instead
+# of visiting every match. A full window may have older matches: the next
+# window is the one before its smallest rowid.
+def search_candidates(text, before=None, db_path=None):
+    query = search_query(text)
+    if query is None:
+        return 0, None
+    return tuple(db.fetchone('''
+        SELECT count(*), min(rowid) FROM (
+            SELECT rowid FROM contact_submissions_fts
+            WHERE contact_submissions_fts MATCH ? AND rowid <= ?
+            ORDER BY rowid DESC LIMIT ?
+        )
+    ''', (query, MAX_ROWID if before is None else before - 1, SEARCH_CANDIDATES), db_path))
+
+
+# One page of search results, best match first, ranked within a candidate
+# window (cutoff <= rowid < before, from search_candidates). Each row has a
+# snippet of the best-matching column with the matched terms between
+# HIGHLIGHT_START and HIGHLIGHT_END.
+def search(text, page=0, page_size=PAGE_SIZE, cutoff=None, before=None, db_path=None):
+    query = search_query(text)
+    if query is None:
+        return []
+    if cutoff is None:
+        cutoff = search_candidates(text, before, db_path)[1]
+        if cutoff is None:
+            return []
+    return db.fetchall('''
+        SELECT s.id, s.name, s.email, s.submitted_at,
+               snippet(contact_submissions_fts, -1, ?, ?, '…', 16)
+        FROM contact_submissions_fts
+        JOIN contact_submissions s ON s.id = contact_submissions_fts.rowid
+        WHERE contact_submissions_fts MATCH ? AND contact_submissions_fts.rowid BETWEEN ? AND ?
+        ORDER BY rank LIMIT ? OFFSET ?
+    ''', (HIGHLIGHT_START, HIGHLIGHT_END, query, cutoff, MAX_ROWID if before is None else before - 1,
+          page_size, page * page_size), db_path)
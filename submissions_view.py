@@ -0,0 +1,120 @@
+import re
+
+import pandas as pd
+import streamlit as st
+
+import submissions
+
+MARKDOWN_SPECIAL = re.compile(r'([\\`*_{}\[\]()#+\-.!|<>~$])')
+
+
+def _highlight(snippet):
+    text = MARKDOWN_SPECIAL.sub(r'\\\1', snippet)
+    return text.replace(submissions.HIGHLIGHT_START, '**').replace(submissions.HIGHLIGHT_END, '**')
+
+
+# Ranked full-text results, one page per rerun; the page number resets when
+# the search text changes. Results are kept in the session, keyed on the
+# query, page and table size, so reruns from unrelated widgets don't
+# search again.
+# Results are ranked within windows of up to SEARCH_CANDIDATES matches,
+# newest first; "Older matches" moves on to the window before the current one
+def render_search(text, page_size=submissions.PAGE_SIZE, key="submissions"):
+    page_key = f"{key}_search_page"
+    window_key = f"{key}_search_window"
+    cache_key = f"{key}_search_cache"
+    if st.session_state.get(f"{key}_search_for") != text:
+        st.session_state[f"{key}_search_for"] = text
+        st.session_state[page_key] = 0
+        st.session_state[window_key] = 0
+    page = st.session_state[page_key]
+    window = st.session_state[window_key]
+
+    try:
+        version = (text, submissions.total_count())
+        cache = st.session_state.get(cache_key)
+        if cache is None or cache['version'] != version:
+            cache = st.session_state[cache_key] = {'version': version, 'windows': [], 'pages': {}}
+        # (before, matches, cutoff) per window; each starts below the previous one's cutoff
+        windows = cache['windows']
+        while len(windows) <= window:
+            before = windows[-1][2] if windows else None
+            windows.append((before,) + submissions.search_candidates(text, before))
+        before, total, cutoff = windows[window]
+        if (window, page) not in cache['pages']:
+            cache['pages'][window, page] = submissions.search(text, page, page_size, cutoff, before) if total else []
+        rows = cache['pages'][window, page]
+    except Exception as e:
+        st.error(f"Search failed: {e}")
+        return
+
+    full = total >= submissions.SEARCH_CANDIDATES
+    if window:
+        st.caption(f"Older matches: {total} submitted before #{before}, best first")
+    if not total:
+        st.write("No older matches." if window else "No matching submissions.")
+    else:
+        pages = (total + page_size - 1) // page_size
+        if full:
+            st.info(f"Only the {'next ' if window else ''}{total} newest matches are ranked here. Refine your "
+                    f"search, or use \"Older matches\" to continue with earlier submissions.")
+        st.caption(f"{total} matches, page {page + 1} of {pages}")
+        for row_id, name, email, submitted_at, snippet in rows:
+            st.markdown(f"**#{row_id}** {_highlight(name)} · {_highlight(email)} · {submitted_at}  \n"
+                        f"{_highlight(snippet)}")
+
+    col_newer, col_prev, col_next, col_older = st.columns(4)
+    if col_newer.button("Newer matches", key=f"{key}_search_newer", disabled=window == 0):
+        st.session_state[window_key] -= 1
+        st.session_state[page_key] = 0
+        st.rerun()
+    if col_prev.button("Previous results", key=f"{key}_search_prev", disabled=page == 0):
+        st.session_state[page_key] -= 1
+        st.rerun()
+    if col_next.button("Next results", key=f"{key}_search_next", disabled=len(rows) < page_size):
+        st.session_state[page_key] += 1
+        st.rerun()
+    if col_older.button("Older matches", key=f"{key}_search_older", disabled=not full):
+        st.session_state[window_key] += 1
+        st.session_state[page_key] = 0
+        st.rerun()
+
+
+# Paginated submissions table; the session keeps a stack of page cursors so
+# each rerun reads exactly one indexed page. A search box above it switches
+# to ranked full-text results.
+def render_submissions(page_size=submissions.PAGE_SIZE, key="submissions"):
+    query = st.text_input("Search submissions (name, email or message)", key=f"{key}_query").strip()
+    if query:
+        render_search(query, page_size, key)
+        return
+
+    cursors_key = f"{key}_cursors"
+    if cursors_key not in st.session_state:
+        st.session_state[cursors_key] = []
+    cursors = st.session_state[cursors_key]
+
+    total = submissions.total_count()
+    archived = submissions.archived_count()
+    if archived:
+        st.caption(f"{total + archived} submissions all time, {archived} of them archived")
+        with st.expander("Submissions per day"):
+            daily = submissions.daily_counts()
+            st.bar_chart(pd.DataFrame(daily, columns=['day', 'submissions']).set_index('day'))
+    if not total:
+        st.write("No submissions found.")
+        return
+
+    after = cursors[-1] if cursors else None
+    rows, next_cursor = submissions.fetch_page(after, page_size)
+    pages = (total + page_size - 1) // page_size
+    st.caption(f"{total} submissions, page {len(cursors) + 1} of {pages}")
+    st.dataframe(pd.DataFrame(rows, columns=submissions.COLUMNS), use_container_width=True, hide_index=True)
+
+    col_prev, col_next = st.columns(2)
+    if col_prev.button("Previous page", key=f"{key}_prev", disabled=not cursors):
+        cursors.pop()
+        st.rerun()
+    if col_next.button("Next page", key=f"{key}_next", disabled=next_cursor is None):
+        cursors.append(next_cursor)
+        st.rerun()
@@ -0,0 +1,120 @@
+import logging
+import queue
+import threading
+import time
+
+import db
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Flush when this many rows are waiting or the oldest has waited this long
+BATCH_SIZE = 100
+FLUSH_INTERVAL_MS = 20
+# Submissions beyond this are rejected (503) instead of queueing without limit
+MAX_QUEUE = 10000
+# How long a handler waits for its batch to commit before giving up
+COMMIT_TIMEOUT = 10
+
+INSERT_SQL = 'INSERT INTO contact_submissions (name, email, message) VALUES (?, ?, ?)'
+
+
+# One queued submission; the handler waits on it until its batch commits
+class PendingSubmission:
+    __slots__ = ('row', 'done', 'error')
+
+    def __init__(self, row):
+        self.row = row
+        self.done = threading.Event()
+        self.error = None
+
+    def wait(self, timeout=COMMIT_TIMEOUT):
+        if not self.done.wait(timeout):
+            raise TimeoutError("Timed out waiting for submission to be committed")
+        if self.error is not None:
+            raise self.error
+
+
+# Group-commit writer: handlers enqueue rows, a single thread inserts them
+# with executemany in one transaction per batch (one fsync per batch)
+class SubmissionWriter:
+    def __init__(self, db_path, batch_size=BATCH_SIZE, flush_interval_ms=FLUSH_INTERVAL_MS,
+                 max_queue=MAX_QUEUE):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000.0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="submission-writer", daemon=True)
+        self._thread.start()
+
+    def depth(self):
+        return self._queue.qsize()
+
+    # Raises queue.Full when the writer is saturated
+    def submit(self, name, email, message):
+        if self._closed:
+            raise queue.Full("Submission writer is closed")
+        pending = PendingSubmission((name, email, message))
+        self._queue.put_nowait(pending)
+        return pending
+
+    def close(self, timeout=COMMIT_TIMEOUT):
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _run(self):
+        db.use_own_connection()
+        conn = db.get_connection(self.db_path)
+        # FULL keeps every acknowledged batch durable; the batch amortises the fsync
+        conn.execute('PRAGMA synchronous=FULL')
+        try:
+            stopping = False
+            while not stopping:
+                first = self._queue.get()
+                if first is None:
+                    break
+                batch = [first]
+                deadline = time.monotonic() + self.flush_interval
+                while len(batch) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = self._queue.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        stopping = True
+                        break
+                    batch.append(item)
+                self._flush(conn, batch)
+            # Drain anything submitted before close()
+            leftover = []
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not None:
+                    leftover.append(item)
+            if leftover:
+                self._flush(conn, leftover)
+        finally:
+            db.close_connection(self.db_path)
+
+    def _flush(self, conn, batch):
+        error = None
+        try:
+            db.executemany(INSERT_SQL, [p.row for p in batch], self.db_path)
+            db.commit(self.db_path)
+            metrics.WRITE_BATCH_SIZE.observe(len(batch))
+            logger.debug("Committed batch of %d submissions", len(batch))
+        except Exception as e:
+            logger.error("Batch insert error: %s", e)
+            conn.rollback()
+            error = e
+        for p in batch:
+            p.error = error
+            p.done.set()